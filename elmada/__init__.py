@@ -12,14 +12,21 @@ __copyright__ = f"Copyright (C) 2021 {__author__}"
 
 # isort: off
 
-from .mode import get_mode, set_mode
-from .helper import set_api_keys, make_symlink_to_cache
+from .mode import get_dtype_policy, get_mode, set_dtype_policy, set_mode
+from .helper import (
+    set_api_keys,
+    make_symlink_to_cache,
+    set_memory_cache_size,
+    clear_memory_cache,
+    set_cef_cache_suffix,
+)
 
 # isort: on
 
 from . import (
     cc_share,
     eu_pwl,
+    fetch,
     from_entsoe,
     from_geo_scraped,
     from_geo_via_morph,
@@ -27,13 +34,20 @@ from . import (
     from_other,
     from_smard,
     helper,
+    manifest,
     paths,
     plots,
+    replay,
+    uncertainty,
+    web,
 )
 from .main import (
     get_el_national_generation,
     get_emissions,
+    get_emissions_batch,
+    get_emissions_sweep,
     get_merit_order,
     get_prices,
     get_residual_load,
 )
+from .merit_order import MeritOrder
@@ -0,0 +1,5 @@
+import sys
+
+from elmada.cli import main
+
+sys.exit(main())
@@ -6,13 +6,12 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Un
 
 import numpy as np
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 
 from elmada import eu_pwl, from_geo_via_morph
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
@@ -117,9 +116,8 @@ def get_geo_list(
 
 def _scrape_geo_list(fuel: str):
     fuel_ = fuel.capitalize()
-    base_url = "http://globalenergyobservatory.org/"
-    url = base_url + f"list.php?db=PowerPlants&type={fuel_}"
-    page = requests.get(url).text
+    url = web.BASE_URLS["geo"] + f"list.php?db=PowerPlants&type={fuel_}"
+    page = web.get(url).text
     soup = BeautifulSoup(page, "lxml")
     my_table = soup.find("table")
     headers = [cell.get_text().strip() for cell in my_table.find_all("h2")]
@@ -169,8 +167,8 @@ def get_wiki_shares(cache: bool = True) -> pd.Series:
 
 
 def get_ccgt_IE():
-    url = "https://en.wikipedia.org/w/index.php?&oldid=942359418"
-    page = requests.get(url).text
+    url = web.BASE_URLS["wikipedia_en"] + "w/index.php?&oldid=942359418"
+    page = web.get(url).text
     soup = BeautifulSoup(page, "lxml")
 
     my_table = soup.find("table", {"class": "wikitable sortable"})
@@ -192,8 +190,8 @@ def get_ccgt_IE():
 
 
 def get_ccgt_AT():
-    url = "https://de.wikipedia.org/w/index.php?oldid=199043393"
-    page = requests.get(url).text
+    url = web.BASE_URLS["wikipedia_de"] + "w/index.php?oldid=199043393"
+    page = web.get(url).text
     soup = BeautifulSoup(page, "lxml")
 
     my_table = soup.find_all("table", {"class": "wikitable sortable"})[3]
@@ -240,8 +238,8 @@ def get_ccgt_AT():
 
 
 def get_ccgt_IT():
-    url = "https://de.wikipedia.org/w/index.php?&oldid=194656154"
-    page = requests.get(url).text
+    url = web.BASE_URLS["wikipedia_de"] + "w/index.php?&oldid=194656154"
+    page = web.get(url).text
     soup = BeautifulSoup(page, "lxml")
 
     my_table = soup.find_all("table", {"class": "wikitable sortable"})[1]
@@ -0,0 +1,312 @@
+"""Command-line interface of elmada.
+
+Example:
+    python -m elmada warm --years 2017-2020 --countries DE,FR --methods XEF_PWL,MEF_PP,hist_EP \
+        --freq 60min,15min --jobs 4
+"""
+
+import argparse
+import itertools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import elmada
+from elmada import mappings as mp
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARN)
+
+PRICE_METHODS = ("hist_EP", "hist_SM")
+DE_ONLY_METHODS = ("PP", "PWLv", "hist_SM")
+STAGES = ("generation", "prices", "emissions")
+MAX_PASSES = 3
+
+
+def parse_years(s: str) -> List[int]:
+    """Returns the years of a string like '2017-2020' or '2015,2017-2019'."""
+    years = []
+    for part in s.split(","):
+        first, _, last = part.partition("-")
+        years.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(years))
+
+
+def _parse_list(s: str) -> List[str]:
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+
+def make_tasks(
+    stage: str,
+    years: Iterable[int],
+    countries: Iterable[str],
+    methods: Iterable[str],
+    freqs: Iterable[str],
+) -> List[Dict]:
+    """Returns the unique tasks of a stage of the cache warming.
+
+    The stages depend on each other in the order of `STAGES`: the emissions are calculated from
+    the generation data. Emission methods that share a cache file, e.g. 'XEF_PWL' and 'MEF_PWL',
+    result in one task. Combinations that are not supported, e.g. 'MEF_PP' for France, are
+    omitted.
+    """
+    emission_methods = sorted({m.split("_")[1] for m in methods if m not in PRICE_METHODS})
+    price_methods = [m for m in PRICE_METHODS if m in methods]
+    tasks = []
+    for year, country in itertools.product(years, countries):
+        if stage == "generation":
+            if emission_methods:
+                tasks.append(dict(stage=stage, year=year, country=country))
+            continue
+        for freq in freqs:
+            for method in price_methods if stage == "prices" else emission_methods:
+                if stage == "prices":
+                    method = elmada.main._get_price_method(year, country, method)
+                if country != "DE" and method in DE_ONLY_METHODS:
+                    continue
+                task = dict(stage=stage, year=year, country=country, freq=freq, method=method)
+                if task not in tasks:
+                    tasks.append(task)
+    return tasks
+
+
+def get_cache_fp(task: Dict) -> Path:
+    """Returns the file path the task caches its result in."""
+    year, country = task["year"], task["country"]
+    if task["stage"] == "generation":
+        return elmada.from_entsoe._get_generation_fp(year=year, country=country)
+    elif task["stage"] == "prices":
+        module = elmada.from_entsoe if task["method"] == "hist_EP" else elmada.from_smard
+        return module._get_dayahead_prices_fp(year=year, freq=task["freq"], country=country)
+    else:
+        return elmada.main._get_emissions_cache_fp(
+            year=year,
+            freq=task["freq"],
+            country=country,
+            method=task["method"],
+            inputs=elmada.main._get_inputs(year=year, country=country),
+        )
+
+
+def run_task(task: Dict, config: Dict[str, Any]) -> Tuple[Optional[str], float]:
+    """Caches the result of a task and returns None or the error, and the duration in seconds.
+
+    `config` is a snapshot of the settings of the calling process, see `mode.get_config`.
+    """
+    elmada.mode.set_config(config)
+    config = dict(year=task["year"], country=task["country"])
+    start = time.perf_counter()
+    try:
+        if task["stage"] == "generation":
+            elmada.from_entsoe.load_el_national_generation(**config, freq=None)
+        elif task["stage"] == "prices":
+            elmada.main.get_prices(**config, freq=task["freq"], method=task["method"])
+        else:
+            elmada.main.get_emissions(**config, freq=task["freq"], method=f"_{task['method']}")
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", time.perf_counter() - start
+    return None, time.perf_counter() - start
+
+
+def _get_label(task: Dict) -> str:
+    keys = ("stage", "year", "country", "freq", "method")
+    return " ".join(str(task[k]) for k in keys if k in task)
+
+
+def warm(
+    years: Iterable[int],
+    countries: Optional[Iterable[str]] = None,
+    methods: Iterable[str] = ("XEF_PWL",),
+    freqs: Iterable[str] = ("60min",),
+    jobs: Optional[int] = None,
+) -> Dict[str, List[str]]:
+    """Fills the cache for all combinations of the arguments and prints the progress.
+
+    The stages in `STAGES` are run one after another. Within a stage, the tasks whose cache files
+    do not exist yet are run in a process pool. Since cached emissions are addressed by the
+    fingerprints of their input files, results can be invalidated by input files that other tasks
+    of the stage cache, e.g. the power plant list. These tasks are run again in up to
+    `MAX_PASSES` passes.
+
+    Args:
+        years: Years
+        countries: alpha-2 country codes. If None, `mappings.COUNTRIES_FOR_ANALYSIS` are used.
+        methods: Methods of `get_emissions` and the historic methods of `get_prices`,
+            i.e. 'hist_EP' and 'hist_SM'.
+        freqs: Frequencies, e.g. '60min' or '15min'
+        jobs: Maximum number of worker processes. If 1, the tasks are run in the current process.
+
+    Returns:
+        Dictionary with the task labels of the keys 'hits', 'fetched', and 'failed'. The labels
+        of failed tasks include the error.
+    """
+    countries = list(mp.COUNTRIES_FOR_ANALYSIS) if countries is None else list(countries)
+    years, methods, freqs = list(years), list(methods), list(freqs)
+    summary = dict(hits=[], fetched=[], failed=[])
+
+    for stage in STAGES:
+        todo = []
+        for task in make_tasks(stage, years, countries, methods, freqs):
+            if get_cache_fp(task).exists():
+                summary["hits"].append(_get_label(task))
+            else:
+                todo.append(task)
+
+        for _ in range(MAX_PASSES):
+            fetched = []
+            for i, (task, error, duration) in enumerate(_run_tasks(todo, jobs), 1):
+                label = _get_label(task)
+                if error is None:
+                    fetched.append(task)
+                    if label not in summary["fetched"]:
+                        summary["fetched"].append(label)
+                    print(f"[{stage} {i}/{len(todo)}] {label}: done in {duration:.1f} s")
+                else:
+                    summary["failed"].append(f"{label}: {error}")
+                    print(f"[{stage} {i}/{len(todo)}] {label}: failed ({error})")
+            todo = [task for task in fetched if not get_cache_fp(task).exists()]
+            if not todo:
+                break
+
+    return summary
+
+
+def _run_tasks(
+    tasks: Sequence[Dict], jobs: Optional[int]
+) -> Iterable[Tuple[Dict, Optional[str], float]]:
+    """Yields the tasks with their error or None and their duration in the order of completion."""
+    config = elmada.mode.get_config()
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield (task, *run_task(task, config))
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_task, task, config): task for task in tasks}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
+
+
+def _print_summary(summary: Dict[str, List[str]]) -> None:
+    print(
+        f"Summary: {len(summary['hits'])} hits, {len(summary['fetched'])} fetched, "
+        f"{len(summary['failed'])} failed."
+    )
+    for failure in summary["failed"]:
+        print(f"\tfailed: {failure}")
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="elmada", description=elmada.__summary__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm_parser = subparsers.add_parser(
+        "warm", help="Fill the cache, e.g. to pre-build a cache image before serving traffic."
+    )
+    warm_parser.add_argument(
+        "--years", type=parse_years, default="2017-2020", help="e.g. '2017-2020' or '2017,2019'"
+    )
+    warm_parser.add_argument(
+        "--countries",
+        type=_parse_list,
+        default=None,
+        help="alpha-2 country codes, e.g. 'DE,FR'. Default: all countries for analysis.",
+    )
+    warm_parser.add_argument(
+        "--methods",
+        type=_parse_list,
+        default="XEF_PWL",
+        help="methods of get_emissions and 'hist_EP', 'hist_SM' of get_prices",
+    )
+    warm_parser.add_argument(
+        "--freq", type=_parse_list, default="60min", help="frequencies, e.g. '60min,15min'"
+    )
+    warm_parser.add_argument(
+        "--jobs", type=int, default=None, help="number of worker processes. Default: CPU count."
+    )
+    warm_parser.add_argument("--mode", choices=["safe", "live"], default=None)
+    warm_parser.add_argument("--dtype-policy", choices=["default", "compact"], default=None)
+
+    fetch_parser = subparsers.add_parser(
+        "fetch", help="Query the missing ENTSO-E input data concurrently, see elmada.fetch."
+    )
+    fetch_parser.add_argument("--years", type=parse_years, default="2017-2020")
+    fetch_parser.add_argument("--countries", type=_parse_list, default=None)
+    fetch_parser.add_argument(
+        "--kinds",
+        type=_parse_list,
+        default=",".join(elmada.fetch.KINDS),
+        help="e.g. 'gen,installedGen,prices'",
+    )
+    fetch_parser.add_argument(
+        "--max-concurrency", type=int, default=elmada.fetch.DEFAULT_MAX_CONCURRENCY
+    )
+    fetch_parser.add_argument("--mode", choices=["safe", "live"], default=None)
+
+    stand_in_parser = subparsers.add_parser(
+        "stand-in", help="Serve recorded responses of the external data sources, see elmada.replay."
+    )
+    stand_in_parser.add_argument("--cassette", required=True, help="cassette directory")
+    stand_in_parser.add_argument(
+        "--record", action="store_true", help="record requests missing in the cassette"
+    )
+    stand_in_parser.add_argument("--port", type=int, default=8765)
+    stand_in_parser.add_argument("--latency", type=float, default=0.0, help="in seconds")
+    stand_in_parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503"
+    )
+    return parser
+
+
+def _serve_stand_in(args: argparse.Namespace) -> int:
+    server = elmada.replay.StandInServer(
+        args.cassette,
+        record=args.record,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        port=args.port,
+    )
+    print(f"Serving {args.cassette} at {server.url}. Redirect clients with")
+    print(f"\texport {elmada.web.STAND_IN_URL_ENV}={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Requests: {dict(server.counts)}")
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Runs the command line interface and returns the exit code."""
+    args = make_parser().parse_args(argv)
+
+    if args.command == "stand-in":
+        return _serve_stand_in(args)
+
+    if args.mode is not None:
+        elmada.set_mode(args.mode)
+
+    if args.command == "fetch":
+        summary = elmada.fetch.fetch_inputs(
+            years=args.years,
+            countries=args.countries,
+            kinds=args.kinds,
+            max_concurrency=args.max_concurrency,
+        )
+        _print_summary(summary)
+        return 1 if summary["failed"] else 0
+
+    if args.dtype_policy is not None:
+        elmada.set_dtype_policy(args.dtype_policy)
+
+    summary = warm(
+        years=args.years,
+        countries=args.countries,
+        methods=args.methods,
+        freqs=args.freq,
+        jobs=args.jobs,
+    )
+    _print_summary(summary)
+    return 1 if summary["failed"] else 0
@@ -6,6 +6,7 @@ import pandas as pd
 
 from elmada import cc_share, from_entsoe, from_geo_scraped, from_opsd, from_other
 from elmada import mappings as mp
+from elmada.merit_order import MeritOrder
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.WARN)
@@ -20,14 +21,34 @@ def prep_CEFs(
     freq: str = "60min",
     country: str = "DE",
     validation_mode: bool = False,
-    mo_P: Optional[pd.DataFrame] = None,
+    mo_P: Optional[Union[pd.DataFrame, MeritOrder]] = None,
+    resi_T: Optional[pd.Series] = None,
     **mo_kwargs,
 ) -> pd.DataFrame:
     """Prepares XEFs for European countries with piece-wise-linear approximation method"""
 
     if mo_P is None:
         mo_P = merit_order(year=year, country=country, validation_mode=validation_mode, **mo_kwargs)
-    return from_opsd.get_CEFs_from_merit_order(mo_P=mo_P, year=year, freq=freq, country=country)
+    return from_opsd.get_CEFs_from_merit_order(
+        mo_P=mo_P, year=year, freq=freq, country=country, resi_T=resi_T
+    )
+
+
+def prep_CEFs_for_scenarios(
+    scenarios: Dict[Any, Dict],
+    year: int = 2019,
+    freq: str = "60min",
+    country: str = "DE",
+    validation_mode: bool = False,
+) -> pd.DataFrame:
+    """Prepares CEFs for several merit-order scenarios against the same residual load, e.g.
+    `{"low": dict(overwrite_carbon_tax=20), "high": dict(overwrite_carbon_tax=80)}`.
+    """
+    mo_Ps = {
+        k: merit_order(year=year, country=country, validation_mode=validation_mode, **mo_kwargs)
+        for k, mo_kwargs in scenarios.items()
+    }
+    return from_opsd.get_CEFs_from_merit_orders(mo_Ps=mo_Ps, year=year, freq=freq, country=country)
 
 
 def merit_order(
@@ -40,6 +61,28 @@ def merit_order(
 ) -> pd.DataFrame:
     """Return a merit-order list. Virtual power plants are constructed through discretization."""
 
+    df = merit_order_base(
+        year=year,
+        country=country,
+        approx_method=approx_method,
+        validation_mode=validation_mode,
+        pp_size_method=pp_size_method,
+    )
+    carbon_price = (
+        from_other.get_ETS_price(year) if overwrite_carbon_tax is None else overwrite_carbon_tax
+    )
+    return apply_carbon_price(df, carbon_price=carbon_price)
+
+
+def merit_order_base(
+    year: int = 2019,
+    country: str = "DE",
+    approx_method: str = "regr",
+    validation_mode: bool = False,
+    pp_size_method: str = "from_geo_scraped",
+) -> pd.DataFrame:
+    """Return the unsorted virtual power plants with all carbon price independent data."""
+
     mo_f = merit_order_per_fuel(
         year=year, country=country, approx_method=approx_method, validation_mode=validation_mode
     )
@@ -49,18 +92,14 @@ def merit_order(
     df["x_k"] = df["fuel_draf"].map(from_other.get_fuel_prices(year=year, country=country))
 
     DATA_QUASCH = from_other.get_emissions_per_fuel_quaschning()
-    marginal_emissions_of_gen = df["fuel_draf"].map(DATA_QUASCH) / df["used_eff"]
     df["fuel_cost"] = df["x_k"] / df["used_eff"]
+    df["marginal_emissions"] = df["fuel_draf"].map(DATA_QUASCH) / df["used_eff"]
+    return df
 
-    carbon_price = (
-        from_other.get_ETS_price(year) if overwrite_carbon_tax is None else overwrite_carbon_tax
-    )
-    df["GHG_cost"] = marginal_emissions_of_gen * carbon_price
-    df["marginal_emissions"] = marginal_emissions_of_gen
-    df["marginal_cost"] = df["fuel_cost"] + df["GHG_cost"]
 
-    df = df.sort_values("marginal_cost").reset_index(drop=True)
-    df["cumsum_capa"] = df["capa"].cumsum()
+def apply_carbon_price(mo_base: pd.DataFrame, carbon_price: float) -> pd.DataFrame:
+    """Return the merit order sorted by marginal cost for a given carbon price in €/t."""
+    df = from_opsd.apply_carbon_price(mo_base, carbon_price=carbon_price)
     df = df.dropna()
     return df.copy()
 
@@ -0,0 +1,115 @@
+"""Concurrent acquisition of the ENTSO-E input data of many countries and years.
+
+The loaders in `elmada.from_entsoe` are blocking. Here, they are scheduled with asyncio on a
+bounded thread pool, so that many series are queried at the same time. The loaders write the
+same cache files as if they were called directly. All their queries share the per-host
+request quota of `from_entsoe.RATE_LIMITER` and are retried on transient errors.
+"""
+
+import asyncio
+import functools
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from elmada import from_entsoe
+from elmada import mappings as mp
+from elmada import paths
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARN)
+
+KINDS = ("gen", "installedGen", "prices")
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+def get_cache_fp(kind: str, year: int, country: str, freq: str = "60min") -> Path:
+    """Returns the cache file of an input series of a kind in `KINDS`."""
+    if kind == "prices":
+        return from_entsoe._get_dayahead_prices_fp(year=year, freq=freq, country=country)
+    return paths.mode_dependent_cache_fp(year, country, kind=kind)
+
+
+def load(kind: str, year: int, country: str, freq: str = "60min") -> None:
+    """Loads an input series of a kind in `KINDS` and caches it."""
+    if kind == "gen":
+        from_entsoe.load_el_national_generation(year=year, country=country, freq=None)
+    elif kind == "installedGen":
+        from_entsoe.load_installed_generation_capacity(year=year, country=country)
+    elif kind == "prices":
+        from_entsoe.prep_dayahead_prices(year=year, freq=freq, country=country)
+    else:
+        raise ValueError(f"Kind {kind} is not in {KINDS}.")
+
+
+async def fetch_inputs_async(
+    years: Iterable[int],
+    countries: Optional[Iterable[str]] = None,
+    kinds: Iterable[str] = KINDS,
+    freq: str = "60min",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> Dict[str, List[str]]:
+    """Coroutine of `fetch_inputs`."""
+    countries = list(mp.COUNTRIES_FOR_ANALYSIS) if countries is None else countries
+    unknown_kinds = set(kinds) - set(KINDS)
+    if unknown_kinds:
+        raise ValueError(f"Kinds {unknown_kinds} are not in {KINDS}.")
+    summary = dict(hits=[], fetched=[], failed=[])
+    todo = []
+    for kind, year, country in itertools.product(kinds, years, countries):
+        label = f"{kind} {year} {country}"
+        if get_cache_fp(kind, year, country, freq).exists():
+            summary["hits"].append(label)
+        else:
+            todo.append((label, functools.partial(load, kind, year, country, freq)))
+
+    loop = asyncio.get_running_loop()
+
+    async def run(label: str, func) -> None:
+        try:
+            await loop.run_in_executor(executor, func)
+        except Exception as e:
+            logger.warning(f"Fetching {label} failed: {e}")
+            summary["failed"].append(f"{label}: {type(e).__name__}: {e}")
+        else:
+            summary["fetched"].append(label)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        await asyncio.gather(*(run(label, func) for label, func in todo))
+    return summary
+
+
+def fetch_inputs(
+    years: Iterable[int],
+    countries: Optional[Iterable[str]] = None,
+    kinds: Iterable[str] = KINDS,
+    freq: str = "60min",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> Dict[str, List[str]]:
+    """Queries the missing ENTSO-E input data of all combinations concurrently and caches them.
+
+    Within a running event loop, e.g. in Jupyter, await `fetch_inputs_async` instead.
+
+    Args:
+        years: Years
+        countries: alpha-2 country codes. If None, `mappings.COUNTRIES_FOR_ANALYSIS` are used.
+        kinds: Kinds of input data, i.e. 'gen' (generation), 'installedGen' (installed
+            generation capacity), and 'prices' (day-ahead prices).
+        freq: Frequency of the day-ahead prices, e.g. '60min'.
+        max_concurrency: Maximal number of series loaded at the same time.
+
+    Returns:
+        Dictionary with the labels '{kind} {year} {country}' of the keys 'hits', 'fetched', and
+        'failed'. The labels of failed series include the error.
+    """
+    return asyncio.run(
+        fetch_inputs_async(
+            years=years,
+            countries=countries,
+            kinds=kinds,
+            freq=freq,
+            max_concurrency=max_concurrency,
+        )
+    )
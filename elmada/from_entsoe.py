@@ -1,18 +1,38 @@
+import contextlib
 import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import entsoe
 import numpy as np
 import pandas as pd
+import requests
 
 from elmada import exceptions
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
+from elmada.mode import is_compact_dtype_policy
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.WARN)
 
+QUERY_CHUNK_FREQ = "MS"  # pandas frequency of the boundaries of split generation queries
+QUERY_MAX_WORKERS = 12  # maximal number of concurrent queries of one generation download
+QUERY_MAX_ATTEMPTS = 5  # maximal number of attempts of a query that fails transiently
+QUERY_BASE_DELAY = 2.0  # delay in seconds before the first retry, doubled for each further one
+
+# ENTSO-E allows 400 requests per minute and user, see the guide of the Transparency Platform
+# RESTful API. The limiter is shared by all queries of the process.
+RATE_LIMITER = hp.RateLimiter(max_calls=400, period=60.0)
+
+# Maximal number of ENTSO-E requests in flight in the process, e.g. if the chunked downloads of
+# several series run concurrently, see `elmada.fetch`.
+QUERY_SEMAPHORE = threading.BoundedSemaphore(32)
+
 
 def prep_XEFs(year: int = 2019, freq: str = "60min", country: str = "DE") -> pd.DataFrame:
     """Prepare grid mix emission factors from historic generation."""
@@ -41,7 +61,11 @@ def prep_XEFs(year: int = 2019, freq: str = "60min", country: str = "DE") -> pd.
 
 
 def _get_client() -> entsoe.EntsoePandasClient:
-    return entsoe.EntsoePandasClient(api_key=hp.get_api_key("entsoe"))
+    """Returns a client with the pooled session of the current thread, see `web.get_session`.
+
+    Clients must not be shared between threads, since their sessions are not thread-safe.
+    """
+    return entsoe.EntsoePandasClient(api_key=hp.get_api_key("entsoe"), session=web.get_session())
 
 
 def _get_timestamps(year: int, tz: str) -> Tuple:
@@ -64,25 +88,28 @@ def load_installed_generation_capacity(
     country.
     """
 
-    fp = paths.mode_dependent_cache_dir() / f"{year}_{country}_installedGen_entsoe.parquet"
+    fp = paths.mode_dependent_cache_fp(year, country, kind="installedGen")
     warning = f"No installed generation capacity data available for {year}, {country}"
 
-    if cache and fp.exists():
-        df = hp.read(fp, squeeze=False)
-    else:
-        try:
-            df = _query_installed_generation_capacity(year, country)
+    is_locked = cache and not fp.exists()
 
-            if df.empty:
-                logger.warning(f"{warning}: ENTSO-E returned an empty dataframe.")
-                return _get_empty_installed_generation_capacity_df(ensure_std_techs)
+    with hp.file_lock(fp) if is_locked else contextlib.nullcontext():
+        if cache and fp.exists():
+            df = hp.read(fp, squeeze=False)
+        else:
+            try:
+                df = _query_installed_generation_capacity(year, country)
 
-            if cache:
-                hp.write(df, fp)
+                if df.empty:
+                    logger.warning(f"{warning}: ENTSO-E returned an empty dataframe.")
+                    return _get_empty_installed_generation_capacity_df(ensure_std_techs)
 
-        except (entsoe.exceptions.NoMatchingDataError, KeyError) as e:
-            logger.error(f"{e}: {warning}")
-            return _get_empty_installed_generation_capacity_df(ensure_std_techs)
+                if cache:
+                    hp.write(df, fp)
+
+            except (entsoe.exceptions.NoMatchingDataError, KeyError) as e:
+                logger.error(f"{e}: {warning}")
+                return _get_empty_installed_generation_capacity_df(ensure_std_techs)
 
     if ensure_std_techs:
         df = aggregate_to_standard_techs(df)
@@ -90,12 +117,17 @@ def load_installed_generation_capacity(
     return df
 
 
+@hp.single_flight
 def _query_installed_generation_capacity(year, country) -> pd.DataFrame:
     client = _get_client()
     tz = get_timezone(country)
     start, end = _get_timestamps(year=year, tz=tz)
-    df = client.query_installed_generation_capacity(
-        start=start, end=end, country_code=country, psr_type=None
+    df = _query_with_retry(
+        client.query_installed_generation_capacity,
+        start=start,
+        end=end,
+        country_code=country,
+        psr_type=None,
     )
     return df
 
@@ -129,21 +161,53 @@ def load_el_national_generation(
     ensure_non_zero_sum: bool = True,
     fillna: bool = True,
     resample: bool = True,
+    update: bool = False,
+    fuels: Optional[Iterable[str]] = None,
 ) -> pd.DataFrame:
+    """Returns the electricity generation per fuel type.
+
+    If `update` is True and cached data of the live cache ends before the end of the year, only
+    the data published since the last cached timestamp are queried and appended to the cache.
+
+    With the compact dtype policy, see `elmada.set_dtype_policy`, the data are float32.
+
+    If `fuels` are given, e.g. `mappings.CONV`, only these fuel types are returned. Then, only the
+    ENTSO-E production types that are renamed or aggregated to these fuels are read from the
+    cache file and processed.
+    """
     assert year in range(2000, 2100), f"{year} is not a valid year"
     assert freq in [None, "15min", "30min", "60min"], f"{freq} is not a valid frequency"
     assert country in mp.EUROPE_COUNTRIES
+    assert fuels is None or ensure_std_techs, "`fuels` requires `ensure_std_techs=True`."
 
-    fp = paths.mode_dependent_cache_dir(year, country) / f"{year}_{country}_gen_entsoe.parquet"
+    fp = _get_generation_fp(year, country)
 
-    if cache and fp.exists():
-        df = hp.read(fp)
+    # Zero-sum rows can only be detected on a subset of columns if all values are non-negative:
+    columns = None
+    is_projectable = (
+        fuels is not None and not update and (ensure_positive or not ensure_non_zero_sum)
+    )
 
-    else:
-        df = _query_generation(year, country, split_queries)
+    # workers that need the same data wait for the one that queries them:
+    is_locked = cache and (not fp.exists() or (update and fp.parent == paths.CACHE_DIR))
 
-        if cache:
-            hp.write(df, fp)
+    with hp.file_lock(fp) if is_locked else contextlib.nullcontext():
+        if cache and fp.exists():
+            if is_projectable:
+                columns = get_raw_generation_columns(hp.read_column_names(fp), fuels=fuels)
+            df = hp.read(fp, in_memory=True, squeeze=columns is None, columns=columns)
+
+            if update and fp.parent == paths.CACHE_DIR:
+                len_before = len(df)
+                df = _append_new_generation(df, year, country)
+                if len(df) > len_before:
+                    hp.write(df, fp)
+
+        else:
+            df = _query_generation(year, country, split_queries)
+
+            if cache:
+                hp.write(df, fp)
 
     data_freq = hp.estimate_freq(df)
 
@@ -151,16 +215,25 @@ def load_el_national_generation(
         idx = hp.make_datetimeindex(year, data_freq, tz=df.index.tz)
         df = df.reindex(idx)
         df = df.reset_index(drop=True)
+    else:
+        df = df.copy()  # data from the in-memory cache are read-only
 
     if ensure_std_techs:
-        df = aggregate_to_standard_techs(df)
+        # the added zero columns would otherwise stay integers if the data are not upsampled
+        df = aggregate_to_standard_techs(df).astype(float)
 
     if ensure_positive:
         # set negative values as missing values e.g. for HU and NL in 2019
         df[df < 0] = np.nan
 
     if ensure_non_zero_sum:
-        df[df.sum(1) == 0.0] = np.nan
+        is_zero_sum = df.sum(1) == 0.0
+        if columns is not None and _needs_other_columns(df, columns, is_zero_sum, fillna):
+            all_columns = get_raw_generation_columns(hp.read_column_names(fp), mp.DRAF_FUELS)
+            other_columns = [c for c in all_columns if c not in columns]
+            other = _read_generation_columns(fp, other_columns, year, data_freq, ensure_std_index)
+            is_zero_sum &= other.where(other >= 0).sum(1) == 0.0
+        df[is_zero_sum] = np.nan
 
     if fillna:
         df = fill_special_missing_data_points_for_gen(df=df, country=country, year=year)
@@ -169,23 +242,103 @@ def load_el_national_generation(
     if resample:
         df = hp.resample(df, year=year, start_freq=data_freq, target_freq=freq)
 
+    if fuels is not None:
+        df = df[[f for f in df.keys() if f in set(fuels)]]
+
+    if is_compact_dtype_policy():
+        df = df.astype(np.float32)
+
     return df
 
 
+def get_raw_generation_columns(columns: Iterable[str], fuels: Iterable[str]) -> List[str]:
+    """Returns the ENTSO-E production types in `columns` that are renamed or aggregated to one of
+    the given fuel types, see `mappings.FUEL_RENAME` and `mappings.FUEL_AGGREGATION`.
+    """
+    fuels = set(fuels)
+    return [c for c in columns if _to_std_tech(c) in fuels]
+
+
+def _to_std_tech(column: str) -> str:
+    renamed = mp.FUEL_RENAME.get(column, column)
+    return mp.FUEL_AGGREGATION.get(renamed, renamed)
+
+
+def _needs_other_columns(
+    df: pd.DataFrame, columns: List[str], is_zero_sum: pd.Series, fillna: bool
+) -> bool:
+    """Returns if the zero-sum rows of the loaded `columns` must be checked with the other
+    columns, i.e. if setting these rows to NaN could change the result.
+    """
+    if not is_zero_sum.any():
+        return False
+    if not fillna:
+        return True
+    # Zero columns added by `aggregate_to_standard_techs` are restored by the filling. Rows
+    # with only missing values in the loaded columns are not changed.
+    loaded = df[list({_to_std_tech(c) for c in columns} & set(df.keys()))]
+    return loaded.isna().all(axis=None) or (is_zero_sum & loaded.notna().any(axis=1)).any()
+
+
+def _read_generation_columns(
+    fp: Path, columns: List[str], year: int, data_freq: str, ensure_std_index: bool
+) -> pd.DataFrame:
+    df = hp.read(fp, squeeze=False, in_memory=True, columns=columns)
+    if ensure_std_index:
+        df = df.reindex(hp.make_datetimeindex(year, data_freq, tz=df.index.tz))
+        df = df.reset_index(drop=True)
+    return df
+
+
+def _get_generation_fp(year: int, country: str) -> Path:
+    return paths.mode_dependent_cache_fp(year, country, kind="gen")
+
+
+def _append_new_generation(df: pd.DataFrame, year: int, country: str) -> pd.DataFrame:
+    """Returns the generation data extended by the data published after its last timestamp."""
+    tz = get_timezone(country)
+    last = df.index[-1]
+    start = last + pd.Timedelta(hp.estimate_freq_from_dtindex(df))
+    end = min(_get_timestamps(year=year, tz=tz)[1], pd.Timestamp.now(tz=tz).floor("h"))
+    if start >= end:
+        return df
+
+    try:
+        new = _query_with_retry(
+            _get_client().query_generation, start=start, end=end, country_code=country
+        )
+    except (entsoe.exceptions.NoMatchingDataError, KeyError) as e:
+        logger.warning(f"No new generation data for {year, country} after {last}: {e}")
+        return df
+
+    return pd.concat([df, new[new.index > last]], sort=True)
+
+
+def get_number_of_valid_steps(year: int, country: str, freq: str) -> int:
+    """Returns the number of timesteps of the frequency `freq` that are completely covered by
+    the cached generation data, e.g. less than 8760 for '60min' and part-year data.
+    """
+    df = hp.read(_get_generation_fp(year, country), in_memory=True)
+    data_freq = hp.estimate_freq_from_dtindex(df)
+    idx = hp.make_datetimeindex(year, data_freq, tz=df.index.tz)
+    n_data_steps = idx.get_indexer([df.index[-1]])[0] + 1
+    return n_data_steps * hp.int_from_freq(data_freq) // hp.int_from_freq(freq)
+
+
+@hp.single_flight
 def _query_generation(year, country, split_queries) -> pd.DataFrame:
-    client = _get_client()
     tz = get_timezone(country)
     if split_queries:
-        df = _query_generation_monthly(year, country, client, tz)
+        df = _query_generation_chunked(year, country, tz)
     else:
-        df = _query_generation_yearly(year, country, client, tz)
+        df = _query_generation_yearly(year, country, _get_client(), tz)
     return df
 
 
 def _query_generation_yearly(year, country, client, tz) -> pd.DataFrame:
     try:
         start, end = _get_timestamps(year=year, tz=tz)
-        df = client.query_generation(start=start, end=end, country_code=country)
+        df = _query_with_retry(client.query_generation, start=start, end=end, country_code=country)
     except (entsoe.exceptions.NoMatchingDataError, KeyError) as e:
         err_message = f"{e}: entsoe-client has no geneneration data found for {year, country}"
         logger.error(err_message)
@@ -206,46 +359,98 @@ def fill_special_missing_data_points_for_gen(
         df.iloc[35036:35040] = df.iloc[35032:35036].values
 
     if year == 2018 and country == "LT":
-        logger.warning(f"1 outlier for {year}, {country}, other_conv/Other removed.")
-        try:
-            df["other_conv"] = hp.remove_outlier(df["other_conv"], zscore_threshold=10)
-        except KeyError:
-            df["Other"] = hp.remove_outlier(df["Other"], zscore_threshold=10)
-
-    if year == 2018 and country == "LT":
-        logger.warning(f"3 outlier for {year}, {country}, solar/Solar removed.")
-        try:
-            df["solar"] = hp.remove_outlier(df["solar"], zscore_threshold=10)
-        except KeyError:
-            df["Solar"] = hp.remove_outlier(df["Solar"], zscore_threshold=10)
+        # the columns are missing if only a subset of fuels is loaded
+        for col in ["other_conv", "Other"]:
+            if col in df:
+                logger.warning(f"1 outlier for {year}, {country}, {col} removed.")
+                df[col] = hp.remove_outlier(df[col], zscore_threshold=10)
+                break
+
+        for col in ["solar", "Solar"]:
+            if col in df:
+                logger.warning(f"3 outlier for {year}, {country}, {col} removed.")
+                df[col] = hp.remove_outlier(df[col], zscore_threshold=10)
+                break
 
     return df
 
 
-def _query_generation_monthly(year, country, client, tz) -> pd.DataFrame:
-    logger.warning(f"Querying generation data from entsoe for {country}: this may take minutes.")
-    logger.info(f"Loading 12 month of electrcity generation individually:")
-
-    d = {}
-    for month in range(1, 13):
-        start, end = _get_timestamps_for_month(year, tz, month)
+def _query_generation_chunked(year, country, tz) -> pd.DataFrame:
+    """Returns the generation data queried in chunks of `QUERY_CHUNK_FREQ`, e.g. monthly.
 
+    The chunks are queried concurrently by up to `QUERY_MAX_WORKERS` threads within the request
+    quota of `RATE_LIMITER` and concatenated in chronological order. Each chunk is stored in a
+    staging directory as soon as it arrives. So, if a chunk fails, a later call only queries the
+    missing chunks. The staging directory is removed once all chunks are available. Each thread
+    queries with its own client, see `_get_client`.
+    """
+    chunks = _get_query_chunks(year, tz, freq=QUERY_CHUNK_FREQ)
+    staging_dir = _get_staging_dir(year, country)
+    logger.warning(f"Querying generation data from entsoe for {country} in {len(chunks)} chunks.")
+
+    def query(chunk: Tuple[pd.Timestamp, pd.Timestamp]) -> pd.DataFrame:
+        start, end = chunk
+        fp = staging_dir / f"{start:%Y%m%d%H%M}_{end:%Y%m%d%H%M}.parquet"
+        if fp.exists():
+            return hp.read(fp, squeeze=False)
         try:
-            logger.warning(f"Loading month {month} / 12")
-            d[month] = client.query_generation(start=start, end=end, country_code=country)
+            df = _query_with_retry(
+                _get_client().query_generation, start=start, end=end, country_code=country
+            )
         except (entsoe.exceptions.NoMatchingDataError, KeyError) as e:
             raise exceptions.NoDataError(
                 f"Entsoe-client has no geneneration data found for {year, country}: {e}"
             )
-    return pd.concat(d.values(), sort=True)
+        hp.write(df, fp)
+        return df
+
+    # all chunks are queried even if one fails, so that a later call has less to query:
+    with ThreadPoolExecutor(max_workers=min(QUERY_MAX_WORKERS, len(chunks))) as executor:
+        futures = [executor.submit(query, chunk) for chunk in chunks]
+    df = pd.concat([future.result() for future in futures], sort=True)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    return df
 
 
-def _get_timestamps_for_month(year, tz, month):
-    start = pd.Timestamp(year=year, month=month, day=1, tz=tz)
-    _year = year if month < 12 else year + 1
-    _month = month + 1 if month < 12 else 1
-    end = pd.Timestamp(year=_year, month=_month, day=1, tz=tz)
-    return start, end
+def _get_staging_dir(year: int, country: str) -> Path:
+    """Returns the hidden directory of the chunks of an incomplete generation download."""
+    return paths.CACHE_DIR / ".staging" / f"{year}_{country}_gen_entsoe"
+
+
+def _query_with_retry(query: Callable, **kwargs) -> Any:
+    """Returns `query(**kwargs)` within the limits of `QUERY_SEMAPHORE` and `RATE_LIMITER` and
+    retries transient errors with exponential backoff.
+    """
+
+    def call():
+        with QUERY_SEMAPHORE:
+            RATE_LIMITER.acquire()
+            return query(**kwargs)
+
+    return hp.retry(
+        call,
+        is_transient=_is_transient_error,
+        max_attempts=QUERY_MAX_ATTEMPTS,
+        base_delay=QUERY_BASE_DELAY,
+    )
+
+
+def _is_transient_error(e: Exception) -> bool:
+    """Returns if a query error is worth a retry, i.e. connection errors, timeouts, HTTP 429
+    (too many requests), and server errors.
+    """
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return False
+
+
+def _get_query_chunks(year, tz, freq: str = "MS") -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """Returns the (start, end) timestamps of the chunks of a year, e.g. months for 'MS'."""
+    start, end = _get_timestamps(year=year, tz=tz)
+    bounds = pd.date_range(start, end, freq=freq).union([start, end])
+    return list(zip(bounds[:-1], bounds[1:]))
 
 
 def prep_residual_load(
@@ -277,26 +482,27 @@ def get_subset_of(df, subset: Union[List, Set]) -> Tuple[pd.Series, Set]:
 
 
 def get_conventional_generation(year, freq, country) -> pd.Series:
-    gen_TF = load_el_national_generation(year=year, freq=freq, country=country)
+    gen_TF = load_el_national_generation(year=year, freq=freq, country=country, fuels=mp.CONV)
     conv_ser, available_conv = get_subset_of(gen_TF, mp.CONV)
     logger.info(f"Available CONV-fuels for {country}: {available_conv}")
     return conv_ser
 
 
 def get_conv2_generation(year, freq, country) -> pd.Series:
-    gen_TF = load_el_national_generation(year=year, freq=freq, country=country)
+    gen_TF = load_el_national_generation(year=year, freq=freq, country=country, fuels=mp.CONV2)
     conv_ser, available_conv = get_subset_of(gen_TF, mp.CONV2)
     logger.info(f"Available CONV-fuels for {country}: {available_conv}")
     return conv_ser
 
 
 def get_renewable_generation(year, freq, country) -> pd.Series:
-    gen_TF = load_el_national_generation(year=year, freq=freq, country=country)
+    gen_TF = load_el_national_generation(year=year, freq=freq, country=country, fuels=mp.RES)
     res_ser, available_vres = get_subset_of(gen_TF, mp.RES)
     logger.info(f"Available RES-fuels for {country}: {available_vres}")
     return res_ser
 
 
+@hp.reference_data(files=lambda: [paths.DATA_DIR / "tranberg/specific_emission_factors.csv"])
 def load_el_national_specific_emissions() -> pd.DataFrame:
     """Read specific emissions data from [Tranberg.2019] in gCO2eq/kWh.
 
@@ -355,7 +561,7 @@ def prep_dayahead_prices(
     assert year in range(2000, 2100), f"{year} is not a valid year"
     assert country in entsoe.Area.__dict__
 
-    fp = paths.CACHE_DIR / f"{year}_{freq}_{country}_dayahead_c_el_entsoe.parquet"
+    fp = _get_dayahead_prices_fp(year, freq, country)
 
     # bidding_zone = get_bidding_zone(country, year)
 
@@ -389,12 +595,19 @@ def prep_dayahead_prices(
     return ser
 
 
+def _get_dayahead_prices_fp(year: int, freq: str, country: str) -> Path:
+    return paths.CACHE_DIR / f"{year}_{freq}_{country}_dayahead_c_el_entsoe.parquet"
+
+
+@hp.single_flight
 def _query_day_ahead_prices(year, bidding_zone) -> pd.Series:
     client = _get_client()
     tz = get_timezone(bidding_zone)
     try:
         start, end = _get_timestamps(year=year, tz=tz)
-        ser = client.query_day_ahead_prices(start=start, end=end, country_code=bidding_zone)
+        ser = _query_with_retry(
+            client.query_day_ahead_prices, start=start, end=end, country_code=bidding_zone
+        )
     except entsoe.exceptions.NoMatchingDataError as e:
         raise exceptions.NoDataError(
             f"Entsoe-client has no price-data found for {year, bidding_zone}: {e}"
@@ -1,11 +1,10 @@
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 
 from elmada import from_geo_via_morph
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
 
 
 def get_pp_sizes_for_pwl() -> pd.DataFrame:
@@ -28,7 +27,7 @@ def get_units_of_geo_list(cache: bool = True) -> pd.DataFrame:
     fp = paths.mode_dependent_cache_dir() / "units_of_geo_list.parquet"
 
     if fp.exists() and cache:
-        df = hp.read(fp)
+        df = hp.read(fp, in_memory=True)
 
     else:
         df = _query_geo_power_plant_data()
@@ -70,8 +69,8 @@ def _query_geo_power_plant_data():
 
 
 def get_df_from_geo_id(geo_id: int) -> pd.DataFrame:
-    url = f"http://globalenergyobservatory.org/geoid/{geo_id}"
-    page = requests.get(url).text
+    url = web.BASE_URLS["geo"] + f"geoid/{geo_id}"
+    page = web.get(url).text
     soup = BeautifulSoup(page, "lxml")
     selector = soup.find("div", {"id": "UnitDescription_Block"})
 
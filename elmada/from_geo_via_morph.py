@@ -9,11 +9,10 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Un
 
 import numpy as np
 import pandas as pd
-import requests
 
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
@@ -131,16 +130,20 @@ def filter_relevant_plants(df: pd.DataFrame) -> pd.DataFrame:
     return df.loc[is_ana & is_conv, COLS.keys()].rename(columns=COLS)
 
 
-def get_geo_full_list(cache: bool = True) -> pd.DataFrame:
+def get_geo_full_list(cache: bool = True, update: bool = False) -> pd.DataFrame:
+    """Returns the GEO power plant list. If `update`, the downloaded database is revalidated with
+    Morph and the cached list is rebuilt if the database changed (live mode only).
+    """
 
     fp = paths.mode_dependent_cache_dir() / DB_FILE_NAME.with_suffix(".parquet")
+    fp_db = paths.CACHE_DIR / DB_FILE_NAME.with_suffix(".db")
 
-    if cache and fp.exists():
-        df = hp.read(fp)
+    is_changed = update and fp.parent == paths.CACHE_DIR and download_database(fp=fp_db)
 
-    else:
-        fp_db = paths.CACHE_DIR / DB_FILE_NAME.with_suffix(".db")
+    if cache and fp.exists() and not is_changed:
+        df = hp.read(fp, in_memory=True)
 
+    else:
         if not fp_db.exists():
             download_database(fp=fp_db)
 
@@ -153,12 +156,14 @@ def get_geo_full_list(cache: bool = True) -> pd.DataFrame:
     return df
 
 
-def download_database(fp: Path) -> None:
-    url_base = "https://morph.io/coroa/global_energy_observatory_power_plants/"
+def download_database(fp: Path) -> bool:
+    """Downloads the GEO database and returns whether `fp` was (re)written, see `web.download`."""
+    url_base = web.BASE_URLS["morph"] + "coroa/global_energy_observatory_power_plants/"
     morph_api_key = hp.get_api_key("morph")
     url_ending = f"data.sqlite?key={morph_api_key}"
     url = url_base + url_ending
 
-    response = requests.get(url)
-    logger.info(f"{fp.name} downloaded from GEO via Morph.")
-    fp.write_bytes(response.content)
+    is_downloaded = web.download(url, fp)
+    if is_downloaded:
+        logger.info(f"{fp.name} downloaded from GEO via Morph.")
+    return is_downloaded
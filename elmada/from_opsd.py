@@ -6,13 +6,14 @@ from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
-import requests
 from scipy import stats
 
 import elmada
 from elmada import from_entsoe, from_other
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
+from elmada.merit_order import MeritOrder
+from elmada.mode import is_compact_dtype_policy
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
@@ -23,70 +24,256 @@ def prep_prices(year=2019, freq="60min", country="DE", **mo_kwargs) -> pd.Series
     return prep_CEFs(year=year, freq=freq, country=country, **mo_kwargs)["marginal_cost"]
 
 
-def prep_CEFs(year=2019, freq="60min", country="DE", mo_P=None, **mo_kwargs) -> pd.DataFrame:
-    """Prepares German CEFs from the power plant list from OPSD"""
+def prep_CEFs(
+    year=2019, freq="60min", country="DE", mo_P=None, resi_T=None, **mo_kwargs
+) -> pd.DataFrame:
+    """Prepares German CEFs from the power plant list from OPSD.
+
+    `mo_P` can be a merit-order DataFrame or a `MeritOrder`. If a residual load `resi_T` is
+    given, e.g. a subset of timesteps, the CEFs are only prepared for its timesteps.
+    """
     assert country == "DE", "this function only works for Germany"
     if mo_P is None:
         mo_P = merit_order(year=year, **mo_kwargs)
-    return get_CEFs_from_merit_order(mo_P=mo_P, year=year, freq=freq, country=country)
+    return get_CEFs_from_merit_order(
+        mo_P=mo_P, year=year, freq=freq, country=country, resi_T=resi_T
+    )
+
+
+def prep_CEFs_for_scenarios(
+    scenarios: Dict[Any, Dict], year=2019, freq="60min", country="DE"
+) -> pd.DataFrame:
+    """Prepares German CEFs for several merit-order scenarios, e.g.
+    `{"low": dict(overwrite_carbon_tax=20), "high": dict(overwrite_carbon_tax=80)}`.
+    """
+    assert country == "DE", "this function only works for Germany"
+    mo_Ps = {k: merit_order(year=year, **mo_kwargs) for k, mo_kwargs in scenarios.items()}
+    return get_CEFs_from_merit_orders(mo_Ps=mo_Ps, year=year, freq=freq, country=country)
 
 
 def get_CEFs_from_merit_order(
-    mo_P: pd.DataFrame, year: int, freq: str, country: str, resi_T: Optional[pd.Series] = None
+    mo_P: Union[pd.DataFrame, MeritOrder],
+    year: int,
+    freq: str,
+    country: str,
+    resi_T: Optional[pd.Series] = None,
 ) -> pd.DataFrame:
-    if resi_T is None:
-        resi_T = from_entsoe.prep_residual_load(year=year, freq=freq, country=country)
-    _warn_if_not_enough_capa(mo_P, resi_T)
+    mo = MeritOrder.from_frame(mo_P) if isinstance(mo_P, pd.DataFrame) else mo_P
+    resi_T, total_load_T, transm_eff = get_dispatch_inputs(year, freq, country, resi_T)
+    _warn_if_not_enough_capa(mo, resi_T)
+    return _dispatch_merit_order(mo, resi_T, total_load_T, transm_eff)
+
+
+def get_CEFs_from_merit_orders(
+    mo_Ps: Union[Dict[Any, Union[pd.DataFrame, MeritOrder]], List[Union[pd.DataFrame, MeritOrder]]],
+    year: int,
+    freq: str,
+    country: str,
+    resi_T: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """Returns CEFs for several merit orders dispatched against the same residual load.
+
+    The residual load, total load and transmission efficiency are only prepared once. The
+    returned DataFrame has the columns of `get_CEFs_from_merit_order` for each scenario in a
+    column MultiIndex (scenario, column), e.g. `df.xs("MEFs", axis=1, level=1)` returns the
+    MEFs of all scenarios.
+
+    Args:
+        mo_Ps: Merit orders (DataFrames or `MeritOrder`s) either as dict keyed by scenario name
+            or as list, in which case the list positions are used as scenario names.
+        year: Year
+        freq: Frequency, e.g. '60min' or '15min'
+        country: alpha-2 country code, e.g. 'DE'
+        resi_T: Residual load. If None, it is prepared from ENTSO-E data.
+    """
+    if not isinstance(mo_Ps, dict):
+        mo_Ps = dict(enumerate(mo_Ps))
+
+    resi_T, total_load_T, transm_eff = get_dispatch_inputs(year, freq, country, resi_T)
+
+    mos = {
+        scenario: MeritOrder.from_frame(mo_P) if isinstance(mo_P, pd.DataFrame) else mo_P
+        for scenario, mo_P in mo_Ps.items()
+    }
+    for mo in mos.values():
+        _warn_if_not_enough_capa(mo, resi_T)
+
+    # All merit orders are padded to equal length and dispatched in one 2D call.
+    lengths = np.array([len(mo) for mo in mos.values()])
+    stacked = {col: _stack_padded(mos.values(), col, lengths.max()) for col in _STACKED_COLUMNS}
+    marginal_idx = np.minimum(
+        get_marginal_plant_indices(stacked["cumsum_capa"], resi_T.values),
+        lengths[:, np.newaxis] - 1,
+    )
+    emissions = get_emissions_at_residual_load(
+        cumsum_capa=stacked["cumsum_capa"],
+        capa=stacked["capa"],
+        marginal_emissions=stacked["marginal_emissions"],
+        resi_values=resi_T.values,
+        marginal_idx=marginal_idx,
+    )
+
+    d = {
+        scenario: _dispatch_merit_order(
+            mo,
+            resi_T,
+            total_load_T,
+            transm_eff,
+            marginal_idx=marginal_idx[i],
+            emissions=emissions[i],
+        )
+        for i, (scenario, mo) in enumerate(mos.items())
+    }
+    return pd.concat(d, axis=1, names=["scenario", None])
+
+
+_STACKED_COLUMNS = ("capa", "cumsum_capa", "marginal_emissions")
+
+
+def _stack_padded(mos: Iterable[MeritOrder], col: str, n_plants: int) -> np.ndarray:
+    # Padded plants have no capacity, so the cumulative capacity and emissions stay constant.
+    # They are never marginal as the marginal plant indices are clipped to each merit order.
+    def pad(values: np.ndarray) -> np.ndarray:
+        fill = values[-1] if col == "cumsum_capa" else 0.0
+        return np.pad(values, (0, n_plants - len(values)), constant_values=fill)
+
+    return np.stack([pad(getattr(mo, col)) for mo in mos])
+
+
+def get_dispatch_inputs(
+    year: int, freq: str, country: str, resi_T: Optional[pd.Series] = None
+) -> Tuple[pd.Series, pd.Series, float]:
+    """Returns the residual load, total load and transmission efficiency for a dispatch."""
     total_load_T = from_entsoe.load_el_national_generation(
         year=year, freq=freq, country=country
     ).sum(axis=1)
-    cols = ["cumsum_capa", "marginal_emissions", "capa", "fuel_draf", "used_eff", "marginal_cost"]
-    len_mo = len(mo_P)
-    mo_P_arr = mo_P[cols].values
+    if resi_T is None:
+        resi_T = from_entsoe.prep_residual_load(year=year, freq=freq, country=country)
+    else:
+        total_load_T = total_load_T.reindex(resi_T.index)
     transm_eff = from_other.get_transmission_efficiency(country=country)
+    return resi_T, total_load_T, transm_eff
 
-    def get_data(resi_value: float, what: str = "marginal_emissions"):
-        output_col_index = cols.index(what)
-        for row in range(len_mo):
-            if mo_P_arr[row, 0] > resi_value:
-                return mo_P_arr[row, output_col_index]
-        return mo_P_arr[-1, output_col_index]
-
-    def get_emissions_for_xef(resi_value: float) -> float:
-        # If the residual load is not positive there are no emissions:
-        if resi_value <= 0.0:
-            return 0.0
 
-        emissions = 0.0
-        for row in range(len_mo):
-            emissions += mo_P_arr[row, 1] * mo_P_arr[row, 2]
+def _dispatch_merit_order(
+    mo: MeritOrder,
+    resi_T: pd.Series,
+    total_load_T: pd.Series,
+    transm_eff: float,
+    marginal_idx: Optional[np.ndarray] = None,
+    emissions: Optional[np.ndarray] = None,
+) -> pd.DataFrame:
+    if marginal_idx is None:
+        marginal_idx = get_marginal_plant_indices(mo.cumsum_capa, resi_T.values)
+    if emissions is None:
+        emissions = get_emissions_at_residual_load(
+            cumsum_capa=mo.cumsum_capa,
+            capa=mo.capa,
+            marginal_emissions=mo.marginal_emissions,
+            resi_values=resi_T.values,
+            marginal_idx=marginal_idx,
+        )
 
-            # If the cumsum_capa is above resi_value subtract the emissions of the additional
-            # capacity and return the quotient of emissions and resi_value:
-            if mo_P_arr[row, 0] > resi_value:
-                emissions -= mo_P_arr[row, 1] * (mo_P_arr[row, 0] - resi_value)
-                return emissions
+    def get_data(what: str = "marginal_emissions") -> pd.Series:
+        values = (
+            mo.fuel_names(marginal_idx) if what == "fuel_draf" else getattr(mo, what)[marginal_idx]
+        )
+        return pd.Series(values, index=resi_T.index)
 
-        # If the following code is executed there is not enough generation capacity:
-        return emissions
+    emissions_T = pd.Series(emissions, index=resi_T.index)
 
     df = pd.DataFrame(
         {
             "residual_load": resi_T,
             "total_load": total_load_T,
-            "marginal_fuel": resi_T.apply(get_data, what="fuel_draf"),
-            "efficiency": resi_T.apply(get_data, what="used_eff"),
-            "marginal_cost": resi_T.apply(get_data, what="marginal_cost"),
-            "MEFs": resi_T.apply(get_data, what="marginal_emissions") / transm_eff,
-            "XEFs": (resi_T.apply(get_emissions_for_xef)) / total_load_T / transm_eff,
+            "marginal_fuel": get_data("fuel_draf"),
+            "efficiency": get_data("used_eff"),
+            "marginal_cost": get_data("marginal_cost"),
+            "MEFs": get_data("marginal_emissions") / transm_eff,
+            "XEFs": emissions_T / total_load_T / transm_eff,
         }
     )
 
     df["XEFs"] *= 1000  # convert from t/MWh to kg/MWh or g/kWh
     df["MEFs"] *= 1000  # convert from t/MWh to kg/MWh or g/kWh
+
+    if is_compact_dtype_policy():
+        df["marginal_fuel"] = pd.Categorical.from_codes(
+            mo.fuel_codes[marginal_idx], categories=list(mo.fuels)
+        )
     return df
 
 
+def get_marginal_plant_indices(cumsum_capa: np.ndarray, resi_values: np.ndarray) -> np.ndarray:
+    """Returns the merit-order position of the marginal power plant for each residual load value.
+
+    The marginal power plant is the first one whose cumulative capacity exceeds the residual load.
+    If the generation capacity is not sufficient, the last power plant is marginal.
+
+    `cumsum_capa` can also hold several merit orders with the shape (number of merit orders,
+    number of plants). Then the indices have the shape (number of merit orders, number of
+    residual load values).
+    """
+    if cumsum_capa.ndim == 2:
+        return _get_marginal_plant_indices_of_merit_orders(cumsum_capa, resi_values)
+    indices = np.searchsorted(cumsum_capa, resi_values, side="right")
+    return np.minimum(indices, len(cumsum_capa) - 1)
+
+
+def _get_marginal_plant_indices_of_merit_orders(
+    cumsum_capa: np.ndarray, resi_values: np.ndarray
+) -> np.ndarray:
+    # The residual loads are sorted once. Each plant is located in the sorted residual loads,
+    # i.e. at the number of residual loads below its cumulative capacity. Then the marginal plant
+    # of the t-th sorted residual load is the number of plants located at or before t. All
+    # merit orders are counted in one bincount with integer row offsets, so results are exact.
+    n_mos, n_plants = cumsum_capa.shape
+    n_steps = len(resi_values)
+    order = np.argsort(resi_values)
+    positions = np.searchsorted(resi_values[order], cumsum_capa, side="left")
+    positions += np.arange(n_mos)[:, np.newaxis] * (n_steps + 1)
+    counts = np.bincount(positions.ravel(), minlength=n_mos * (n_steps + 1))
+    sorted_indices = counts.reshape(n_mos, n_steps + 1)[:, :n_steps].cumsum(axis=1)
+    indices = np.empty_like(sorted_indices)
+    indices[:, order] = sorted_indices
+    return np.minimum(indices, n_plants - 1)
+
+
+def get_emissions_at_residual_load(
+    cumsum_capa: np.ndarray,
+    capa: np.ndarray,
+    marginal_emissions: np.ndarray,
+    resi_values: np.ndarray,
+    marginal_idx: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Returns the absolute emissions of the merit order dispatched to each residual load value.
+
+    The emissions of all power plants up to the marginal one are looked up in the cumulative
+    emissions of the merit order. Then the emissions of the unused part of the marginal power
+    plant are subtracted. If the residual load is not positive there are no emissions. If the
+    generation capacity is not sufficient, the emissions of the whole merit order are returned.
+
+    For several merit orders, see `get_marginal_plant_indices`, the arrays of the merit orders
+    are 2D and so are the returned emissions.
+    """
+    if marginal_idx is None:
+        marginal_idx = get_marginal_plant_indices(cumsum_capa, resi_values)
+
+    def at_marginal_plant(values: np.ndarray) -> np.ndarray:
+        return np.take_along_axis(values, marginal_idx, axis=-1)
+
+    cumsum_emissions = np.cumsum(marginal_emissions * capa, axis=-1)
+    unused_emissions = at_marginal_plant(marginal_emissions) * (
+        at_marginal_plant(cumsum_capa) - resi_values
+    )
+    emissions = np.where(
+        cumsum_capa[..., -1:] > resi_values,
+        at_marginal_plant(cumsum_emissions) - unused_emissions,
+        cumsum_emissions[..., -1:],
+    )
+    return np.where(resi_values <= 0.0, 0.0, emissions)
+
+
 def merit_order(
     year=2019,
     efficiency_per_plant: bool = True,
@@ -96,6 +283,26 @@ def merit_order(
 ) -> pd.DataFrame:
     """Prepares the merit order from the German power plant list."""
 
+    df = merit_order_base(
+        year=year,
+        efficiency_per_plant=efficiency_per_plant,
+        emission_data_source=emission_data_source,
+        **preprocess_kwargs,
+    )
+    carbon_price = (
+        from_other.get_ETS_price(year) if overwrite_carbon_tax is None else overwrite_carbon_tax
+    )
+    return apply_carbon_price(df, carbon_price=carbon_price)
+
+
+def merit_order_base(
+    year=2019,
+    efficiency_per_plant: bool = True,
+    emission_data_source: str = "quaschning",
+    **preprocess_kwargs,
+) -> pd.DataFrame:
+    """Returns the unsorted German power plant list with all carbon price independent data."""
+
     df = get_current_active_power_plants(year)
     df = _rename_to_draf_fuels(df)
     df = _preprocess_efficiencies(
@@ -103,17 +310,27 @@ def merit_order(
     )
     df = _add_marginal_emissions_for_gen(df, emission_data_source)
 
-    carbon_price = (
-        from_other.get_ETS_price(year) if overwrite_carbon_tax is None else overwrite_carbon_tax
-    )
     df["x_k"] = df["fuel_draf"].map(from_other.get_fuel_prices(year=year, country="DE"))
     df["fuel_cost"] = df["x_k"] / df["used_eff"]
-    df["GHG_cost"] = df["marginal_emissions_for_gen"] * carbon_price
     df["marginal_emissions"] = df["marginal_emissions_for_gen"]
-    df["marginal_cost"] = df["fuel_cost"] + df["GHG_cost"]
 
     # to be consistent with the PWL merit_order:
     df = df.rename(columns={"capacity_net_bnetza": "capa"})
+    return df
+
+
+def apply_carbon_price(mo_base: pd.DataFrame, carbon_price: float) -> pd.DataFrame:
+    """Returns the merit order sorted by marginal cost for a given carbon price in €/t.
+
+    Args:
+        mo_base: Carbon price independent merit order with the columns 'capa', 'fuel_cost' and
+            'marginal_emissions', e.g. from `merit_order_base`. It is not modified.
+        carbon_price: Carbon price in €/t.
+    """
+    df = mo_base.copy()
+    ghg_cost = df["marginal_emissions"] * carbon_price
+    df.insert(loc=df.columns.get_loc("marginal_emissions"), column="GHG_cost", value=ghg_cost)
+    df["marginal_cost"] = df["fuel_cost"] + df["GHG_cost"]
 
     df = df.sort_values("marginal_cost").reset_index(drop=True)
     df["cumsum_capa"] = df["capa"].cumsum()
@@ -166,12 +383,15 @@ def get_current_active_power_plants(year=2019) -> pd.DataFrame:
     return ca
 
 
-def read_opsd_powerplant_list(which: str = "DE") -> pd.DataFrame:
+def read_opsd_powerplant_list(which: str = "DE", update: bool = False) -> pd.DataFrame:
+    """Reads the OPSD power plant list. If `update`, a cached list is revalidated with OPSD and
+    downloaded again if it changed (live mode only).
+    """
     assert which in ("DE", "EU"), f"`{which}` is no valid value for `which`."
 
     fp = paths.mode_dependent_cache_dir() / f"OPSD_conventional_power_plants_{which}.csv"
 
-    if not fp.exists():
+    if not fp.exists() or (update and fp.parent == paths.CACHE_DIR):
         download_powerplant_list(which=which, fp=fp)
     df = pd.read_csv(fp)
 
@@ -181,14 +401,18 @@ def read_opsd_powerplant_list(which: str = "DE") -> pd.DataFrame:
     return df
 
 
-def download_powerplant_list(which: str, fp: Path) -> None:
+def download_powerplant_list(which: str, fp: Path) -> bool:
+    """Downloads the OPSD power plant list and returns whether `fp` was (re)written, see
+    `web.download`.
+    """
     url = (
-        f"https://data.open-power-system-data.org/conventional_power_plants/latest/"
-        f"conventional_power_plants_{which}.csv"
+        web.BASE_URLS["opsd"]
+        + f"conventional_power_plants/latest/conventional_power_plants_{which}.csv"
     )
-    response = requests.get(url, allow_redirects=True)
-    fp.write_bytes(response.content)
-    logger.info(f"{fp.name} downloaded from OPSD.")
+    is_downloaded = web.download(url, fp)
+    if is_downloaded:
+        logger.info(f"{fp.name} downloaded from OPSD.")
+    return is_downloaded
 
 
 def _rename_to_draf_fuels(
@@ -264,8 +488,8 @@ def _add_marginal_emissions_for_gen(df: pd.DataFrame, emission_data_source: str)
     return df
 
 
-def _warn_if_not_enough_capa(mo_P: pd.DataFrame, resi_ser: pd.DataFrame) -> None:
-    mo_max = mo_P["cumsum_capa"].max() / 1e3
+def _warn_if_not_enough_capa(mo: MeritOrder, resi_ser: pd.DataFrame) -> None:
+    mo_max = np.nanmax(mo.cumsum_capa) / 1e3
     min_resi = resi_ser.min() / 1e3
     if mo_max < min_resi:
         logger.warning(
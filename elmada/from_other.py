@@ -1,5 +1,6 @@
 import logging
 from io import StringIO
+from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
@@ -8,11 +9,15 @@ import pandas as pd
 from elmada import get_mode
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada import paths
+from elmada import paths, web
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.WARN)
 
+DESTATIS_FP = paths.DATA_DIR / "destatis/energiepreisentwicklung-xlsx-5619001.xls"
+DESTATIS_ALL = "all"
+WORLDBANK_FP = paths.DATA_DIR / "worldbank/Data_Extract_From_World_Development_Indicators/Data.csv"
+
 
 def get_ETS_price(year: int) -> float:
     prices = get_ETS_prices()
@@ -28,6 +33,24 @@ def get_ETS_price(year: int) -> float:
         return backup_value
 
 
+def get_ETS_price_series(years: Iterable[int]) -> pd.Series:
+    """Returns ETS prices in €/t for the given years. Years without data get the price of the
+    latest available year, as in `get_ETS_price`.
+    """
+    prices = pd.Series(get_ETS_prices())
+    years = list(years)
+    ser = prices.reindex(years)
+    missing = ser.index[ser.isna()].tolist()
+    if missing:
+        backup_value = prices[prices.index.max()]
+        logger.warning(
+            f"No data for ETS price for {missing} "
+            f"==> Default value of latest available year with {backup_value:.2f} €/t is given."
+        )
+        ser = ser.fillna(backup_value)
+    return ser
+
+
 def get_ETS_prices() -> Dict:
     """Returns carbon emission prices of the EU emissions trading system (ETS) for different years.
 
@@ -56,11 +79,12 @@ def get_ice_eua_prices(cache: bool = True) -> Dict:
     fp = paths.mode_dependent_cache_dir() / "QUANDL_eua_prices.parquet"
 
     if cache and fp.exists():
-        ser = hp.read(fp)
+        ser = hp.read(fp, in_memory=True)
     else:
         import quandl
 
         quandl.ApiConfig.api_key = hp.get_api_key("quandl")
+        quandl.ApiConfig.api_base = web.redirect(web.BASE_URLS["quandl"])
         df = quandl.get("CHRIS/ICE_C1")
         ser = df["Settle"].resample("y").mean().rename("Price")
         ser.index = ser.index.year
@@ -70,6 +94,7 @@ def get_ice_eua_prices(cache: bool = True) -> Dict:
     return ser.to_dict()
 
 
+@hp.reference_data(files=lambda: [paths.DATA_DIR / "sandbag/eua-price.csv"])
 def get_sandbag_eua_prices() -> Dict:
     """Get ETS EUA prices via Sandbag"""
     fp = paths.DATA_DIR / "sandbag/eua-price.csv"
@@ -145,14 +170,7 @@ def _get_lignite_price(year: int = 2019, base_price: float = 6.3) -> float:
         indices: StatistischeBundesamt.2020 (https://www.destatis.de/DE/Themen/Wirtschaft/Preise/Publikationen/Energiepreise/energiepreisentwicklung-pdf-5619001.html)
         base_price: Konstantin.2017 (https://doi.org/10.1007/978-3-662-49823-1)
     """
-    fp = paths.DATA_DIR / "destatis/energiepreisentwicklung-xlsx-5619001.xls"
-    xl = pd.ExcelFile(fp)
-    df = xl.parse(
-        sheet_name=7, skiprows=28, header=None, skipfooter=0, index_col=0, na_values="-"
-    ).dropna(axis=0, how="all")[13]
-
-    df.index = df.index.str.slice(0, 5).astype(int)
-    return df[year] * base_price / 100
+    return get_destatis_fuel_prices().loc[("lignite_index", DESTATIS_ALL, year)] * base_price / 100
 
 
 def _get_coal_price(year: int = 2019, base_price: float = 10.12) -> float:
@@ -163,14 +181,7 @@ def _get_coal_price(year: int = 2019, base_price: float = 10.12) -> float:
         indices: StatistischeBundesamt.2020 (https://www.destatis.de/DE/Themen/Wirtschaft/Preise/Publikationen/Energiepreise/energiepreisentwicklung-pdf-5619001.html)
         base_price: Konstantin.2017 (https://doi.org/10.1007/978-3-662-49823-1)
     """
-    fp = paths.DATA_DIR / "destatis/energiepreisentwicklung-xlsx-5619001.xls"
-    xl = pd.ExcelFile(fp)
-    df = xl.parse(
-        sheet_name=7, skiprows=7, header=None, skipfooter=21, index_col=0, na_values="-"
-    ).dropna(axis=0, how="all")[13]
-
-    df.index = df.index.str.slice(0, 5).astype(int)
-    return df[year] * base_price / 100
+    return get_destatis_fuel_prices().loc[("coal_index", DESTATIS_ALL, year)] * base_price / 100
 
 
 def _get_gas_price(year: int = 2019, country: str = "DE") -> float:
@@ -179,34 +190,15 @@ def _get_gas_price(year: int = 2019, country: str = "DE") -> float:
 
     Source: StatistischeBundesamt.2020 (https://www.destatis.de/DE/Themen/Wirtschaft/Preise/Publikationen/Energiepreise/energiepreisentwicklung-pdf-5619001.html)
     """
-    fp = paths.DATA_DIR / "destatis/energiepreisentwicklung-xlsx-5619001.xls"
-    xl = pd.ExcelFile(fp)
-    nblocks = 4
-    blocksize = 26
-    block_list = []
-    for i in range(nblocks):
-        block_list.append(
-            xl.parse(
-                sheet_name=11,
-                skiprows=4 + i * blocksize,
-                skipfooter=blocksize * (nblocks - 1 - i) + 2,
-                index_col=0,
-                na_values="-",
-            ).dropna(axis=0, how="all")
-        )
-    df = pd.concat(block_list, sort=False, join="outer", axis=1).dropna(axis=1, how="all")
-    df["year"] = df.index.str.slice(5).astype(int)
-    df = df.groupby("year").mean()  # get mean between year-halfs
+    gas = get_destatis_fuel_prices().loc["gas"]
 
-    df = df / 100 * 1000  # convert cent/kWh into €/MWh
-
-    default_value = df.mean().mean()
+    default_value = gas.groupby(level="country", sort=False).mean().mean()
     warn_msg = (
         f"No data for gas price for {year},{country} ==> "
         f"Default value {default_value:.2f} €/MWh is given."
     )
     try:
-        price = df.loc[year, mp.EU_de_for_gas_price[country]]
+        price = gas.loc[(mp.EU_de_for_gas_price[country], year)]
     except KeyError:
         logger.warning(warn_msg)
         return default_value
@@ -219,6 +211,74 @@ def _get_gas_price(year: int = 2019, country: str = "DE") -> float:
         return price
 
 
+def get_destatis_fuel_prices(cache: bool = True) -> pd.Series:
+    """Returns the destatis fuel price data as tidy Series with the index levels
+    (fuel, country, year).
+
+    The fuels are 'coal_index' and 'lignite_index' in % of 2015 for all countries
+    (country=`DESTATIS_ALL`), and 'gas' in €/MWh per country with the German country names
+    of the source. The table is prepared once from the .xls file and cached. It is rebuilt if
+    the .xls file is newer than the cache file.
+    """
+    fp = paths.CACHE_DIR / "destatis_fuel_prices.parquet"
+
+    if cache and fp.exists() and fp.stat().st_mtime_ns >= DESTATIS_FP.stat().st_mtime_ns:
+        return hp.read(fp, in_memory=True)
+
+    ser = prepare_destatis_fuel_prices()
+    if cache:
+        hp.write(ser, fp)
+    return ser
+
+
+def prepare_destatis_fuel_prices() -> pd.Series:
+    """Source: StatistischeBundesamt.2020 (https://www.destatis.de/DE/Themen/Wirtschaft/Preise/Publikationen/Energiepreise/energiepreisentwicklung-pdf-5619001.html)"""
+    xl = pd.ExcelFile(DESTATIS_FP)
+
+    def parse_index(skiprows: int, skipfooter: int) -> pd.DataFrame:
+        ser = xl.parse(
+            sheet_name=7,
+            skiprows=skiprows,
+            header=None,
+            skipfooter=skipfooter,
+            index_col=0,
+            na_values="-",
+        ).dropna(axis=0, how="all")[13]
+        ser.index = ser.index.str.slice(0, 5).astype(int)
+        return pd.DataFrame({"year": ser.index, "country": DESTATIS_ALL, "value": ser.values})
+
+    nblocks = 4
+    blocksize = 26
+    block_list = []
+    for i in range(nblocks):
+        block_list.append(
+            xl.parse(
+                sheet_name=11,
+                skiprows=4 + i * blocksize,
+                skipfooter=blocksize * (nblocks - 1 - i) + 2,
+                index_col=0,
+                na_values="-",
+            ).dropna(axis=0, how="all")
+        )
+    gas = pd.concat(block_list, sort=False, join="outer", axis=1).dropna(axis=1, how="all")
+    gas["year"] = gas.index.str.slice(5).astype(int)
+    gas = gas.groupby("year").mean()  # get mean between year-halfs
+    gas = gas / 100 * 1000  # convert cent/kWh into €/MWh
+    # the country order of the source is kept, since it determines the default gas price:
+    gas = gas.reset_index().melt(id_vars="year", var_name="country")
+
+    df = pd.concat(
+        {
+            "coal_index": parse_index(skiprows=7, skipfooter=21),
+            "lignite_index": parse_index(skiprows=28, skipfooter=0),
+            "gas": gas,
+        },
+        names=["fuel", None],
+    )
+    df = df.reset_index(level=0).set_index(["fuel", "country", "year"])
+    return df["value"].astype(float)
+
+
 def get_fuel_prices(year: int = 2019, country: str = "DE") -> Dict:
     """Get x_k: Fuel price [€ / MWh]
 
@@ -276,22 +336,27 @@ def get_emissions_per_fuel_quaschning() -> Dict:
     return dict(oil=0.28, gas_cc=0.25, gas=0.25, coal=0.34, lignite=0.36, nuclear=0.0)
 
 
+def _get_transmission_efficiency_files(fillna: bool = True, cache: bool = True) -> List[Path]:
+    return [WORLDBANK_FP, paths.mode_dependent_cache_dir() / "transmission_efficiencies.parquet"]
+
+
 def prepare_transmission_losses() -> pd.DataFrame:
     """Source: WorldBank.2020 (https://databank.worldbank.org/reports.aspx?source=2&series=EG.ELC.LOSS.ZS)"""
-    fp = paths.DATA_DIR / "worldbank/Data_Extract_From_World_Development_Indicators/Data.csv"
+    fp = WORLDBANK_FP
     df = pd.read_csv(fp, nrows=58, na_values="..", index_col=2).iloc[:, 3:]
     df = df.rename(columns={k: k[:4] for k in df.keys()})
     df["mean"] = df.loc[:, "2010":"2014"].mean(1)
     return df
 
 
+@hp.reference_data(files=_get_transmission_efficiency_files)
 def get_transmission_efficiency_series(fillna: bool = True, cache: bool = True) -> pd.Series:
     """Returns a Series with transmission efficiencies and long country names in index."""
 
     fp = paths.mode_dependent_cache_dir() / "transmission_efficiencies.parquet"
 
     if cache and fp.exists():
-        ser = hp.read(fp)
+        ser = hp.read(fp, in_memory=True)
 
     else:
         df = prepare_transmission_losses()
@@ -322,3 +387,24 @@ def get_transmission_efficiency(country: str) -> float:
             f"No transmission efficiency data for {country}. European mean of {default} given."
         )
         return default
+
+
+def get_transmission_efficiencies(countries: Optional[Iterable[str]] = None) -> pd.Series:
+    """Returns transmission efficiencies indexed by alpha-2 country codes. Countries without data
+    get the European mean, as in `get_transmission_efficiency`.
+
+    Args:
+        countries: alpha-2 country codes. If None, `mappings.EUROPE_COUNTRIES` are used.
+    """
+    ser = get_transmission_efficiency_series()
+    countries = list(mp.EUROPE_COUNTRIES if countries is None else countries)
+    long_names = [mp.EUROPE_COUNTRIES.get(c) for c in countries]
+    result = pd.Series(ser.reindex(long_names).values, index=countries)
+    missing = result.index[result.isna()].tolist()
+    if missing:
+        default = ser.mean()
+        logger.warning(
+            f"No transmission efficiency data for {missing}. European mean of {default} given."
+        )
+        result = result.fillna(default)
+    return result
@@ -1,5 +1,6 @@
 import logging
 import warnings
+from pathlib import Path
 
 import pandas as pd
 
@@ -17,7 +18,7 @@ def prep_dayahead_prices(
     assert year in range(2000, 2100), f"{year} is not a valid year"
     assert country == "DE", "Smard is only used for Germany!"
 
-    fp = paths.CACHE_DIR / f"{year}_{freq}_{country}_dayahead_c_el_smard.parquet"
+    fp = _get_dayahead_prices_fp(year, freq, country)
 
     if cache and fp.exists():
         ser = hp.read(fp)
@@ -63,3 +64,7 @@ def prep_dayahead_prices(
 
     hp.warn_if_incorrect_index_length(ser, year, freq)
     return ser
+
+
+def _get_dayahead_prices_fp(year: int, freq: str, country: str) -> Path:
+    return paths.CACHE_DIR / f"{year}_{freq}_{country}_dayahead_c_el_smard.parquet"
@@ -1,5 +1,19 @@
+import abc
+import collections
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
 import logging
 import os
+import random
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
 from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
@@ -9,13 +23,22 @@ import numpy as np
 import pandas as pd
 from numpy.core.fromnumeric import squeeze
 
-from elmada import paths
+from elmada import manifest, paths
+from elmada.mode import ConfigUtil
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.WARN)
 
 DEFAULT_HEADER = "DEFAULT_HEADER"
 
+DEFAULT_MEMORY_CACHE_SIZE = 512 * 1024**2  # in bytes
+
+DEFAULT_STALE_LOCK_AGE = 60  # in seconds
+
+CEF_DECIMALS = 2  # decimals of MEFs and XEFs in gCO2eq/kWh_el kept by the compact dtype policy
+
+FIXED_POINT_SUFFIX = "__fp"
+
 APIS = {
     "entsoe": (
         "ENTSO-E API key",
@@ -46,12 +69,20 @@ def delete_cache(filter_str: str = "*") -> None:
     """Deletes parts or all of the cache directory.
 
     Unless `filter_str` is '*' only files are selected that contain the `filter_string` somewhere
-    in the filename.
+    in the filename. Hidden files, e.g. locks and HTTP validators, and directories are skipped.
+    If all files are deleted, the staging directory of partial downloads and stale locks are
+    removed, too. For non-interactive deletion, see `manifest.purge`.
     """
 
     s = "*" if filter_str == "*" else f"*{filter_str}*"
 
-    files = list(paths.CACHE_DIR.glob(f"{s}"))
+    files = [
+        fp
+        for fp in paths.CACHE_DIR.glob(f"{s}")
+        if fp.is_file()
+        and not fp.name.startswith(".")
+        and not fp.name.startswith(paths.MANIFEST_NAME)
+    ]
     lenf = len(files)
 
     if lenf == 0:
@@ -67,6 +98,11 @@ def delete_cache(filter_str: str = "*") -> None:
         if confirm_deletion(lenf):
             for f in files:
                 f.unlink()
+            manifest.forget(files)
+            if filter_str == "*":
+                shutil.rmtree(paths.CACHE_DIR / ".staging", ignore_errors=True)
+                for lock_fp in paths.CACHE_DIR.glob(".*.lock"):
+                    _remove_stale_lock(lock_fp, DEFAULT_STALE_LOCK_AGE)
             print(f"{lenf} files deleted")
 
         else:
@@ -133,48 +169,429 @@ def is_correct_length(df: Union[pd.DataFrame, pd.Series], year: int, freq: str):
     return len_dt == len_inp
 
 
-def write(data: Union[pd.Series, pd.DataFrame], fp: Union[Path, str]) -> None:
+def make_cache_key(*parts: Any) -> str:
+    """Returns a short, stable hash of `parts` for content-addressed cache filenames.
+
+    Dicts are hashed independent of their key order. Objects that are not JSON-serializable are
+    represented by their `repr`.
+    """
+    s = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha1(s.encode()).hexdigest()[:16]
+
+
+def fingerprint_files(fps: Iterable[Path]) -> List[Tuple[str, int, int]]:
+    """Returns path, size and modification time in ns of the given files, sorted by path."""
+    fingerprints = []
+    for fp in fps:
+        stat = fp.stat()
+        fingerprints.append((str(fp), stat.st_size, stat.st_mtime_ns))
+    return sorted(fingerprints)
+
+
+class StorageBackend(abc.ABC):
+    """File format used by `write` and `read` for files with the suffix `suffix`.
+
+    Series are written as DataFrames with their name or `DEFAULT_HEADER` as column name.
+    """
+
+    suffix = ""
+
+    @abc.abstractmethod
+    def write(self, data: Union[pd.Series, pd.DataFrame], fp: Path) -> None:
+        """Writes the data to `fp`."""
+
+    @abc.abstractmethod
+    def read(self, fp: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Returns the data of `fp`, optionally only the given columns."""
+
+    def column_names(self, fp: Path) -> List[str]:
+        """Returns the stored column names without the index."""
+        return list(self.read(fp).columns)
+
+
+class ParquetBackend(StorageBackend):
+    """Parquet files with configurable compression, e.g. 'snappy' or 'zstd', and row group size."""
+
+    suffix = ".parquet"
+
+    def __init__(self, compression: Optional[str] = "snappy", row_group_size: Optional[int] = None):
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def write(self, data: Union[pd.Series, pd.DataFrame], fp: Path) -> None:
+        _to_frame(data).to_parquet(
+            fp, index=True, compression=self.compression, row_group_size=self.row_group_size
+        )
+
+    def read(self, fp: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        return pd.read_parquet(fp, columns=columns)
+
+    def column_names(self, fp: Path) -> List[str]:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(fp)
+        return [c for c in schema.names if c not in _get_index_columns(schema)]
+
+
+class FeatherBackend(StorageBackend):
+    """Arrow IPC (Feather V2) files.
+
+    With `memory_map=True` and without compression, numeric columns without missing values are
+    read zero-copy from the memory-mapped file. Then, the returned data are read-only.
+    """
+
+    suffix = ".feather"
+
+    def __init__(self, compression: str = "uncompressed", memory_map: bool = True):
+        self.compression = compression
+        self.memory_map = memory_map
+
+    def write(self, data: Union[pd.Series, pd.DataFrame], fp: Path) -> None:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        table = pa.Table.from_pandas(_to_frame(data), preserve_index=True)
+        feather.write_feather(table, fp, compression=self.compression)
+
+    def read(self, fp: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        import pyarrow.feather as feather
+
+        if columns is not None:
+            schema = feather.read_table(fp, columns=[], memory_map=True).schema
+            columns = list(columns) + _get_index_columns(schema)
+        table = feather.read_table(fp, columns=columns, memory_map=self.memory_map)
+        return table.to_pandas(split_blocks=True)
+
+    def column_names(self, fp: Path) -> List[str]:
+        import pyarrow.feather as feather
+
+        schema = feather.read_table(fp, columns=[], memory_map=True).schema
+        return [c for c in schema.names if c not in _get_index_columns(schema)]
+
+
+class NpyBackend(StorageBackend):
+    """NumPy .npy files for unnamed numeric Series with a default RangeIndex.
+
+    With `memory_map=True`, the data are read-only views of the memory-mapped file.
+    """
+
+    suffix = ".npy"
+
+    def __init__(self, memory_map: bool = True):
+        self.memory_map = memory_map
+
+    def write(self, data: Union[pd.Series, pd.DataFrame], fp: Path) -> None:
+        df = _to_frame(data)
+        is_supported = (
+            list(df.columns) == [DEFAULT_HEADER]
+            and pd.api.types.is_numeric_dtype(df[DEFAULT_HEADER].dtype)
+            and df.index.equals(pd.RangeIndex(len(df)))
+        )
+        if not is_supported:
+            raise ValueError(".npy files only support unnamed numeric Series with a RangeIndex.")
+        np.save(fp, df[DEFAULT_HEADER].to_numpy(), allow_pickle=False)
+
+    def read(self, fp: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        if columns is not None and list(columns) != [DEFAULT_HEADER]:
+            raise KeyError(f"{columns} not in {fp}")
+        values = np.load(fp, mmap_mode="r" if self.memory_map else None, allow_pickle=False)
+        return pd.DataFrame({DEFAULT_HEADER: values}, copy=False)
+
+    def column_names(self, fp: Path) -> List[str]:
+        return [DEFAULT_HEADER]
+
+
+class CsvBackend(StorageBackend):
+    suffix = ".csv"
+
+    def write(self, data: Union[pd.Series, pd.DataFrame], fp: Path) -> None:
+        _to_frame(data).to_csv(fp, index=True, header=True)
+
+    def read(self, fp: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        data = pd.read_csv(fp, index_col=0)
+        return data if columns is None else data[columns]
+
+    def column_names(self, fp: Path) -> List[str]:
+        return list(pd.read_csv(fp, index_col=0, nrows=0).columns)
+
+
+STORAGE_BACKENDS: Dict[str, StorageBackend] = {
+    backend.suffix: backend
+    for backend in [ParquetBackend(), FeatherBackend(), NpyBackend(), CsvBackend()]
+}
+
+
+def set_storage_backend(backend: StorageBackend) -> None:
+    """Sets the backend used for files with the suffix of `backend`, e.g.
+    `set_storage_backend(ParquetBackend(compression="zstd"))`.
+    """
+    STORAGE_BACKENDS[backend.suffix] = backend
+
+
+def get_storage_backend(fp: Union[Path, str]) -> StorageBackend:
+    suffix = Path(fp).suffix
+    try:
+        return STORAGE_BACKENDS[suffix]
+    except KeyError:
+        raise ValueError(f"Suffix {suffix} not supported")
+
+
+def set_cef_cache_suffix(suffix: str) -> None:
+    """Sets the file format of cached carbon emission factors, e.g. '.parquet' or '.feather'."""
+    assert suffix in STORAGE_BACKENDS and suffix != ".npy", f"{suffix} is not supported"
+    ConfigUtil.cef_cache_suffix = suffix
+
+
+def get_cef_cache_suffix() -> str:
+    return ConfigUtil.cef_cache_suffix
+
+
+def _to_frame(data: Union[pd.Series, pd.DataFrame]) -> pd.DataFrame:
+    if isinstance(data, pd.Series):
+        # NOTE: Parquet can only write dataframes, not series
+        if data.name is None:
+            data.name = DEFAULT_HEADER
+    return pd.DataFrame(data)
+
+
+def _get_index_columns(schema) -> List[str]:
+    metadata = schema.pandas_metadata
+    if not metadata:
+        return []
+    return [c for c in metadata.get("index_columns", []) if isinstance(c, str)]
+
+
+def write(
+    data: Union[pd.Series, pd.DataFrame],
+    fp: Union[Path, str],
+    fixed_point: Optional[Dict[str, int]] = None,
+    backend: Optional[StorageBackend] = None,
+    params: Optional[Dict[str, Any]] = None,
+    source: Optional[str] = None,
+) -> None:
     """Standardized way of writing arrays in draf.
 
+    Files written to `paths.CACHE_DIR` are recorded in the cache manifest, see `manifest`.
+
     Args:
         data: Must be either pandas.Series or pandas.DataFrame.
-        fp: Filepath of a .parquet or .csv file.
+        fp: Filepath with a suffix of `STORAGE_BACKENDS`, e.g. .parquet, .feather, .npy or .csv.
+        fixed_point: Column names and number of decimals of float columns that are stored as
+            32-bit fixed-point integers. `read` restores them as floats.
+        backend: Backend to use instead of the one registered for the suffix of `fp`.
+        params: Parameters the data depend on, which are recorded in the cache manifest.
+        source: Source recorded in the cache manifest. Defaults to the calling function.
     """
 
     fp = Path(fp)
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    backend = get_storage_backend(fp) if backend is None else backend
+
+    if fixed_point:
+        data = _encode_fixed_point(_to_frame(data), fixed_point)
+
+    # readers never see half-written files, since the file is replaced atomically:
+    tmp_fp = fp.parent / f".{fp.stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp{fp.suffix}"
+    try:
+        backend.write(data, tmp_fp)
+        os.replace(tmp_fp, fp)
+    finally:
+        if tmp_fp.exists():
+            tmp_fp.unlink()
+
+    if manifest.is_managed(fp):
+        manifest.record_write(fp, params=params, source=source or manifest.get_caller())
+
+
+@contextlib.contextmanager
+def file_lock(
+    fp: Union[Path, str],
+    timeout: Optional[float] = None,
+    stale_after: float = DEFAULT_STALE_LOCK_AGE,
+    poll_interval: float = 0.1,
+):
+    """Context manager that holds an advisory lock for `fp`, e.g. while its data are computed.
+
+    The lock is the file '.{name}.lock' next to `fp`, which is created exclusively. So, the lock
+    works across processes and hosts that share a file system. While held, the modification time
+    of the lock file is refreshed regularly. Lock files of crashed workers are removed once they
+    have not been refreshed for `stale_after` seconds, see `_remove_stale_lock`.
+
+    Args:
+        fp: File path to lock.
+        timeout: Maximal waiting time in seconds. If None, it is waited until the lock is free.
+        stale_after: Age in seconds after which a lock file is considered stale.
+        poll_interval: Time in seconds between attempts to acquire the lock.
+
+    Raises:
+        TimeoutError: If the lock could not be acquired within `timeout`.
+    """
+    fp = Path(fp)
+    lock_fp = fp.parent / f".{fp.name}.lock"
+    lock_fp.parent.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+
+    while True:
+        try:
+            fd = os.open(lock_fp, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if _is_stale(lock_fp, stale_after):
+                _remove_stale_lock(lock_fp, stale_after)
+                continue
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"Lock {lock_fp} not acquired within {timeout} s.")
+            time.sleep(poll_interval)
+
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{socket.gethostname()} {os.getpid()}")
+
+    released = threading.Event()
+
+    def refresh() -> None:
+        while not released.wait(stale_after / 4):
+            try:
+                os.utime(lock_fp)
+            except FileNotFoundError:
+                return
+
+    heartbeat = threading.Thread(target=refresh, daemon=True)
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        released.set()
+        heartbeat.join()
+        _remove(lock_fp)
 
-    if fp.suffix == ".parquet":
-        if isinstance(data, pd.Series):
-            # NOTE: Parquet can only write dataframes, not series
-            if data.name is None:
-                data.name = DEFAULT_HEADER
-        pd.DataFrame(data).to_parquet(fp, index=True)
-    # elif fp.suffix == ".h5":
-    #     data.to_hdf(fp, key="default", mode="w")
-    elif fp.suffix == ".csv":
-        data.to_csv(fp, index=True, header=True)
-    else:
-        raise ValueError(f"Suffix {fp.suffix} not supported")
 
+def _remove_stale_lock(lock_fp: Path, stale_after: float) -> None:
+    """Removes the lock file if it is stale.
 
-def read(fp: Union[Path, str], squeeze: bool = True) -> Union[pd.Series, pd.DataFrame]:
+    Several waiters can see the same stale lock. If each of them removed it, one could remove
+    the fresh lock that another one created in the meantime. So, the lock file is only removed
+    while holding the takeover lock '{lock}.break' and if it is still stale then.
+    """
+    break_fp = lock_fp.with_name(f"{lock_fp.name}.break")
+    try:
+        fd = os.open(break_fp, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # another waiter takes over, or it crashed while doing so
+        if _is_stale(break_fp, stale_after):
+            _remove(break_fp)
+        return
+    os.close(fd)
+    try:
+        if _is_stale(lock_fp, stale_after):
+            logger.warning(f"Stale lock {lock_fp.name} removed.")
+            _remove(lock_fp)
+    finally:
+        _remove(break_fp)
+
+
+def _is_stale(lock_fp: Path, stale_after: float) -> bool:
+    try:
+        return time.time() - lock_fp.stat().st_mtime > stale_after
+    except FileNotFoundError:
+        return False
+
+
+def _remove(fp: Path) -> None:
+    try:
+        os.remove(fp)
+    except FileNotFoundError:
+        pass
+
+
+def retry(
+    func: Callable[[], Any],
+    is_transient: Callable[[Exception], bool],
+    max_attempts: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+) -> Any:
+    """Returns the result of `func()` and retries it with exponential backoff on transient errors.
+
+    Args:
+        func: Function without arguments.
+        is_transient: Returns if an exception raised by `func` is transient, e.g. a timeout.
+            Other exceptions are raised immediately.
+        max_attempts: Maximal number of calls of `func`.
+        base_delay: Delay in seconds before the first retry. It is doubled for each further retry
+            and randomly reduced by up to 50 % to spread the retries of concurrent workers.
+        max_delay: Maximal delay in seconds.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_attempts or not is_transient(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            logger.warning(
+                f"{type(e).__name__}: {e}. Retry {attempt}/{max_attempts - 1} in {delay:.1f} s."
+            )
+            time.sleep(delay)
+
+
+class RateLimiter:
+    """Limits the number of calls within a sliding time window across threads.
+
+    Args:
+        max_calls: Maximal number of calls per `period`.
+        period: Length of the time window in seconds.
+    """
+
+    def __init__(self, max_calls: int, period: float = 60.0):
+        self.max_calls = max_calls
+        self.period = period
+        self.calls = collections.deque()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a call is allowed and registers it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.calls and now - self.calls[0] >= self.period:
+                    self.calls.popleft()
+                if len(self.calls) < self.max_calls:
+                    self.calls.append(now)
+                    return
+                wait = self.period - (now - self.calls[0])
+            time.sleep(wait)
+
+
+def read(
+    fp: Union[Path, str],
+    squeeze: bool = True,
+    in_memory: bool = False,
+    columns: Optional[List[str]] = None,
+    backend: Optional[StorageBackend] = None,
+) -> Union[pd.Series, pd.DataFrame]:
     """Standardized way of reading arrays in draf.
 
     Args:
-        fp: Filepath of a .parquet, or .csv file.
+        fp: Filepath with a suffix of `STORAGE_BACKENDS`, e.g. .parquet, .feather, .npy or .csv.
         squeeze: If DataFrames with one columns should be transformed into a series
+        in_memory: If the process-local in-memory cache is used. Then, the returned data are
+            read-only, i.e. in-place modifications raise a ValueError.
+        columns: Columns to read. For parquet and feather files, only these columns are read
+            from disk.
+        backend: Backend to use instead of the one registered for the suffix of `fp`.
     """
 
     fp = Path(fp)
 
-    if fp.suffix == ".parquet":
-        data = pd.read_parquet(fp)
-    # elif fp.suffix == ".h5":
-    #     data = pd.read_hdf(fp)
-    elif fp.suffix == ".csv":
-        data = pd.read_csv(fp, index_col=0)
-    else:
-        raise ValueError(f"Suffix {fp.suffix} not supported")
+    if in_memory:
+        return _read_from_memory(fp, squeeze=squeeze, columns=columns, backend=backend)
+
+    backend = get_storage_backend(fp) if backend is None else backend
+    if columns is not None:
+        columns = _get_stored_column_names(backend, fp, columns)
+    data = _decode_fixed_point(backend.read(fp, columns=columns))
+    if manifest.is_managed(fp):
+        manifest.record_access(fp)
 
     if squeeze:
         data = data.squeeze()
@@ -190,6 +607,269 @@ def read(fp: Union[Path, str], squeeze: bool = True) -> Union[pd.Series, pd.Data
     return data
 
 
+def read_column_names(fp: Union[Path, str]) -> List[str]:
+    """Returns the column names of a file without reading its data if the format allows it."""
+    columns = get_storage_backend(fp).column_names(Path(fp))
+    return [_split_fixed_point_name(c)[0] for c in columns]
+
+
+def _split_fixed_point_name(column: Any) -> Tuple[Any, Optional[int]]:
+    """Returns the column name without fixed-point suffix and the number of decimals."""
+    if isinstance(column, str) and FIXED_POINT_SUFFIX in column:
+        name, _, decimals = column.rpartition(FIXED_POINT_SUFFIX)
+        if decimals.isdigit():
+            return name, int(decimals)
+    return column, None
+
+
+def _encode_fixed_point(df: pd.DataFrame, fixed_point: Dict[str, int]) -> pd.DataFrame:
+    d = {}
+    for col in df.columns:
+        if col in fixed_point:
+            decimals = fixed_point[col]
+            values = np.rint(df[col].to_numpy(dtype=float) * 10**decimals)
+            assert np.nanmax(np.abs(values), initial=0) < 2**31, f"{col} exceeds int32 range."
+            is_nan = np.isnan(values)
+            d[f"{col}{FIXED_POINT_SUFFIX}{decimals}"] = pd.arrays.IntegerArray(
+                np.where(is_nan, 0, values).astype(np.int32), mask=is_nan
+            )
+        else:
+            d[col] = df[col]
+    return pd.DataFrame(d, index=df.index)
+
+
+def _decode_fixed_point(df: pd.DataFrame) -> pd.DataFrame:
+    names = {}
+    for col in df.columns:
+        name, decimals = _split_fixed_point_name(col)
+        if decimals is not None:
+            df[col] = df[col].to_numpy(dtype=float, na_value=np.nan) / 10**decimals
+            names[col] = name
+    return df.rename(columns=names) if names else df
+
+
+def _get_stored_column_names(backend: StorageBackend, fp: Path, columns: List[str]) -> List[str]:
+    """Returns the stored names of the requested `columns`, which differ for fixed-point columns."""
+    stored = {_split_fixed_point_name(c)[0]: c for c in backend.column_names(fp)}
+    return [stored.get(c, c) for c in columns]
+
+
+class MemoryCache:
+    """Process-local LRU cache of read files with a byte budget.
+
+    Entries are invalidated if the modification time or size of their file changes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries: "collections.OrderedDict[Tuple, Tuple]" = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Tuple, signature: Tuple) -> Optional[Union[pd.Series, pd.DataFrame]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != signature:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(
+        self, key: Tuple, signature: Tuple, data: Union[pd.Series, pd.DataFrame], nbytes: int
+    ) -> None:
+        with self.lock:
+            self._pop(key)
+            if nbytes > self.max_bytes:
+                return
+            self.entries[key] = (signature, data, nbytes)
+            self.nbytes += nbytes
+            self._evict(self.max_bytes)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def resize(self, max_bytes: int) -> None:
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._evict(max_bytes)
+
+    def _evict(self, max_bytes: int) -> None:
+        while self.nbytes > max_bytes:
+            __, (__, __, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def _pop(self, key: Tuple) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+
+MEMORY_CACHE = MemoryCache()
+
+
+def set_memory_cache_size(max_bytes: int) -> None:
+    """Sets the byte budget of the in-memory cache used by `read(..., in_memory=True)`."""
+    MEMORY_CACHE.resize(max_bytes)
+
+
+def clear_memory_cache() -> None:
+    """Empties the in-memory cache used by `read(..., in_memory=True)`."""
+    MEMORY_CACHE.clear()
+
+
+def _read_from_memory(
+    fp: Path,
+    squeeze: bool,
+    columns: Optional[List[str]] = None,
+    backend: Optional[StorageBackend] = None,
+) -> Union[pd.Series, pd.DataFrame]:
+    stat = fp.stat()
+    key = (str(fp.resolve()), squeeze, None if columns is None else tuple(columns))
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    data = MEMORY_CACHE.get(key, signature)
+    if data is None:
+        data = read(fp, squeeze=squeeze, columns=columns, backend=backend)
+        if not isinstance(data, (pd.Series, pd.DataFrame)):
+            return data
+        nbytes = int(np.sum(data.memory_usage(deep=True)))
+        _make_read_only(data)
+        MEMORY_CACHE.put(key, signature, data, nbytes=nbytes)
+
+    # shallow copy: adding, dropping or renaming columns does not affect the cached entry
+    return data.copy(deep=False)
+
+
+def _make_read_only(data: Union[pd.Series, pd.DataFrame]) -> None:
+    for block in data._mgr.blocks:
+        if isinstance(block.values, np.ndarray):
+            block.values.flags.writeable = False
+
+
+class ReferenceRegistry:
+    """Process-local registry of reference data that are loaded once per process.
+
+    Entries are invalidated if one of the files they are loaded from changes.
+    """
+
+    def __init__(self):
+        self.entries: Dict[Tuple, Tuple] = {}
+        # reentrant, since loaders may call other registered loaders:
+        self.lock = threading.RLock()
+
+    def get(self, key: Tuple, signature: List, load: Callable) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != signature:
+                data = load()
+                if isinstance(data, (pd.Series, pd.DataFrame)):
+                    _make_read_only(data)
+                entry = (signature, data)
+                self.entries[key] = entry
+            return entry[1]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+REFERENCE_REGISTRY = ReferenceRegistry()
+
+
+def reference_data(files: Callable[..., Iterable[Path]]) -> Callable:
+    """Decorator that keeps the results of a loader function in `REFERENCE_REGISTRY`.
+
+    Args:
+        files: Function that is called with the arguments of the loader and returns the files
+            the data are loaded from. Missing files are ignored.
+
+    Series and DataFrames are returned as read-only shallow copies, dicts as copies.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+            signature = fingerprint_files(
+                [Path(fp) for fp in files(*args, **kwargs) if Path(fp).exists()]
+            )
+            data = REFERENCE_REGISTRY.get(key, signature, lambda: func(*args, **kwargs))
+            if isinstance(data, (pd.Series, pd.DataFrame)):
+                return data.copy(deep=False)
+            elif isinstance(data, dict):
+                return data.copy()
+            return data
+
+        return wrapper
+
+    return decorator
+
+
+def clear_reference_registry() -> None:
+    """Empties the registry of reference data, see `reference_data`."""
+    REFERENCE_REGISTRY.clear()
+
+
+class SingleFlight:
+    """Process-wide registry of the calls in flight, see `single_flight`."""
+
+    def __init__(self):
+        self.calls: Dict[Tuple, Future] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: Tuple, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns the result of `func()` and if it was shared, i.e. computed by another thread.
+
+        If a call with the same key is in flight, its result is awaited instead of calling
+        `func`. Its exception is raised in all waiting threads.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            is_shared = future is not None
+            if not is_shared:
+                future = self.calls[key] = Future()
+        if is_shared:
+            return future.result(), True
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.calls[key]
+        return future.result(), False
+
+
+SINGLE_FLIGHT = SingleFlight()
+
+
+def single_flight(func: Callable) -> Callable:
+    """Decorator that coalesces concurrent calls with the same arguments into one call.
+
+    Threads that call the function while an identical call is in flight wait for its result
+    instead of calling the function again. Nothing is cached: a call after the call in flight
+    returned runs the function again. Waiting threads get copies of Series and DataFrames.
+    """
+
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # positional and keyword arguments are coalesced:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__module__, func.__qualname__, tuple(bound.arguments.items()))
+        data, is_shared = SINGLE_FLIGHT.do(key, lambda: func(*args, **kwargs))
+        if is_shared and isinstance(data, (pd.Series, pd.DataFrame)):
+            return data.copy()
+        return data
+
+    return wrapper
+
+
 def warn_if_incorrect_index_length(
     df: Union[pd.DataFrame, pd.Series], year: int, freq: str
 ) -> None:
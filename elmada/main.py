@@ -1,11 +1,17 @@
+import itertools
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import pandas as pd
 
 import elmada
 from elmada import helper as hp
+from elmada import manifest
+from elmada import mappings as mp
 from elmada import paths
+from elmada.merit_order import MeritOrder
 
 logger = logging.getLogger(__name__)
 logger.setLevel(level=logging.WARN)
@@ -18,6 +24,8 @@ def get_emissions(
     method: str = "XEF_PP",
     cache: bool = True,
     use_datetime: bool = False,
+    update: bool = False,
+    fill_to_whole_year: bool = False,
     **mo_kwargs,
 ) -> Union[pd.Series, pd.DataFrame]:
     """Returns dynamic carbon emisson factors in gCO2eq/kWh_el and optional data.
@@ -49,27 +57,43 @@ def get_emissions(
             | _PWL     | Dataframe: extended data for PWL method  |
             | _PWLv    | Dataframe: extended data for PWLv method |
 
-        cache: If cache is used.
+        cache: If cache is used. Cached results are addressed by a hash of all arguments
+            including `mo_kwargs`, the data mode, and the fingerprints of the input files.
+            Results become unreachable if one of the input files changes.
         use_datetime: If True, the index is a timezone agnostic datetime. If False, the index is
             0, 1, 2, etc.
+        update: If True, generation data published since the last cached timestamp are
+            retrieved. If only these generation data changed since the cached result was
+            computed, only the emissions of the new timesteps are computed and appended to the
+            cached result. Useful for daily refreshes of the current year. For the current
+            year, only the timesteps with generation data are returned.
+        fill_to_whole_year: If True, part-year emissions of the current year (see `update`)
+            are forward-filled beyond the last timestep with generation data to the whole year.
         **mo_kwargs: Keyword arguments for merit order creation such as 'overwrite_carbon_tax',
             'efficiency_per_plant', 'emission_data_source'.
     """
     first_method_part, last_method_part = method.split("_")
 
-    fp = paths.CACHE_DIR / f"{year}_{country}_{freq}_CEFs_{last_method_part}.parquet"
+    config = dict(year=year, freq=freq, country=country, method=last_method_part)
 
-    if cache and fp.exists() and not mo_kwargs:
-        df = hp.read(fp, squeeze=False)
+    if update:
+        elmada.from_entsoe.load_el_national_generation(
+            year=year, country=country, freq=None, update=True
+        )
+
+    if cache:
+        df = _get_cached_emissions(**config, update=update, **mo_kwargs)
     else:
-        df = _make_emissions(
-            year=year, freq=freq, country=country, method=last_method_part, **mo_kwargs
+        df = _make_emissions(**config, **mo_kwargs)
+        df, _ = _prep_emissions_for_cache(
+            df, year=year, freq=freq, country=country, drop_steps_without_data=update
         )
-        if cache:
-            hp.write(df, fp)
+
+    if fill_to_whole_year:
+        df = _pad_to_whole_year(df, year=year, freq=freq)
 
     if use_datetime:
-        df.index = hp.make_datetimeindex(year=year, freq=freq)
+        df.index = hp.make_datetimeindex(year=year, freq=freq)[: len(df)]
 
     if first_method_part in ("XEF", "MEF"):
         return df[first_method_part + "s"]
@@ -77,6 +101,172 @@ def get_emissions(
         return df
 
 
+def _get_cached_emissions(
+    year, freq, country, method, update: bool = False, **mo_kwargs
+) -> pd.DataFrame:
+    """Returns the cached emissions or makes and caches them.
+
+    Results of the same arguments but outdated input files are removed when a result is cached.
+    """
+    config = dict(year=year, freq=freq, country=country, method=method)
+    fp = _get_emissions_cache_fp(**config, inputs=_get_inputs(year, country), **mo_kwargs)
+
+    if not fp.exists():
+        with hp.file_lock(_get_emissions_lock_fp(fp)):
+            # another worker could have cached the emissions while this one waited for the lock
+            if not fp.exists():
+                return _make_and_cache_emissions(fp, **config, update=update, **mo_kwargs)
+
+    # copied, since data read from memory-mapped files are read-only
+    return hp.read(fp, squeeze=False).copy()
+
+
+def _make_and_cache_emissions(
+    fp: Path, year, freq, country, method, update: bool, **mo_kwargs
+) -> pd.DataFrame:
+    config = dict(year=year, freq=freq, country=country, method=method)
+    df_old = (
+        _read_updatable_emissions(fp, year=year, freq=freq, country=country) if update else None
+    )
+    if df_old is None:
+        df = _make_emissions(**config, **mo_kwargs)
+    else:
+        df = _update_emissions(df_old, **config, **mo_kwargs)
+    df, fixed_point = _prep_emissions_for_cache(
+        df, year=year, freq=freq, country=country, drop_steps_without_data=update
+    )
+
+    # input files could have been created while making the emissions:
+    inputs = _get_inputs(year, country)
+    fp = _get_emissions_cache_fp(**config, inputs=inputs, **mo_kwargs)
+    hp.write(df, fp, fixed_point=fixed_point, params=dict(**config, **mo_kwargs, inputs=inputs))
+    outdated_fps = _get_previous_emissions_cache_fps(fp)
+    for outdated_fp in outdated_fps:
+        outdated_fp.unlink(missing_ok=True)
+    manifest.forget(outdated_fps)
+    return df
+
+
+def _prep_emissions_for_cache(
+    df: pd.DataFrame, year, freq, country, drop_steps_without_data: bool = False
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """Returns the emissions as they are cached and their fixed-point columns."""
+    if drop_steps_without_data:
+        df = _drop_steps_without_data(df, year=year, freq=freq, country=country)
+    fixed_point = _get_fixed_point_columns(df)
+    for col, decimals in fixed_point.items():
+        df[col] = df[col].round(decimals)
+    return df, fixed_point
+
+
+def _get_inputs(year: int, country: str) -> List[Tuple[str, int, int]]:
+    """Returns the fingerprints of the input files of the emissions, see `paths.input_files`."""
+    return hp.fingerprint_files(paths.input_files(year=year, country=country))
+
+
+def _get_emissions_cache_fp(
+    year, freq, country, method, inputs: List[Tuple[str, int, int]], **mo_kwargs
+) -> Path:
+    args_key = hp.make_cache_key(
+        dict(year=year, freq=freq, country=country, method=method),
+        mo_kwargs,
+        elmada.get_mode(),
+        elmada.get_dtype_policy(),
+        elmada.__version__,
+    )
+    inputs_key = hp.make_cache_key(inputs)
+    suffix = hp.get_cef_cache_suffix()
+    return (
+        paths.CACHE_DIR / f"{year}_{country}_{freq}_CEFs_{method}_{args_key}_{inputs_key}{suffix}"
+    )
+
+
+def _get_fixed_point_columns(df: pd.DataFrame) -> Dict[str, int]:
+    """Returns the CEF columns stored as fixed-point integers and their number of decimals."""
+    if not elmada.mode.is_compact_dtype_policy():
+        return {}
+    return {col: hp.CEF_DECIMALS for col in ("MEFs", "XEFs") if col in df}
+
+
+def _get_emissions_lock_fp(fp: Path) -> Path:
+    """Returns the path locked while emissions are computed, which is independent of the
+    input files, since they can be created during the computation.
+    """
+    return fp.parent / fp.stem.rsplit("_", 1)[0]
+
+
+def _get_previous_emissions_cache_fps(fp: Path) -> List[Path]:
+    """Returns cached results with the same arguments but other input files, newest first."""
+    args_part = fp.stem.rsplit("_", 1)[0]
+    fps = [x for x in fp.parent.glob(f"{args_part}_*{fp.suffix}") if x != fp]
+    return sorted(fps, key=lambda x: x.stat().st_mtime_ns, reverse=True)
+
+
+def _read_updatable_emissions(fp: Path, year, freq, country) -> Optional[pd.DataFrame]:
+    """Returns the newest cached result with the arguments of `fp` that can be extended by
+    `_update_emissions`, or None.
+
+    This is only the case if the generation data of the year and country are the only input
+    file that changed since the result was computed, and they now cover more timesteps.
+    """
+    previous_fps = _get_previous_emissions_cache_fps(fp)
+    if not previous_fps:
+        return None
+    params = manifest.get_params(previous_fps[0]) or {}
+    if "inputs" not in params:
+        return None
+
+    previous_inputs = {tuple(x) for x in params["inputs"]}
+    inputs = set(_get_inputs(year, country))
+    changed_files = {x[0] for x in previous_inputs ^ inputs}
+    if changed_files != {str(elmada.from_entsoe._get_generation_fp(year, country))}:
+        return None
+
+    # copied, so that the memory-mapped file is released before it is replaced
+    df_old = hp.read(previous_fps[0], squeeze=False).copy()
+    n_valid = elmada.from_entsoe.get_number_of_valid_steps(year=year, country=country, freq=freq)
+    return df_old if len(df_old) < n_valid else None
+
+
+def _update_emissions(
+    df_old: pd.DataFrame, year, freq, country, method, **mo_kwargs
+) -> pd.DataFrame:
+    """Returns `df_old` extended by the emissions of the timesteps after its last row.
+
+    For merit-order-based methods, only the new timesteps are dispatched. The EP method is
+    recomputed since its missing values are filled with annual means.
+    """
+    if method == "EP":
+        return _make_emissions(year=year, freq=freq, country=country, method=method)
+
+    resi_T = elmada.from_entsoe.prep_residual_load(year=year, freq=freq, country=country)
+    df_new = _make_emissions(
+        year=year,
+        freq=freq,
+        country=country,
+        method=method,
+        resi_T=resi_T.iloc[len(df_old) :],
+        **mo_kwargs,
+    )
+    return pd.concat([df_old, df_new])
+
+
+def _drop_steps_without_data(df: pd.DataFrame, year, freq, country) -> pd.DataFrame:
+    """Returns only the timesteps covered by generation data if `year` is the current year."""
+    if year < pd.Timestamp.now().year:
+        return df
+    n_valid = elmada.from_entsoe.get_number_of_valid_steps(year=year, country=country, freq=freq)
+    return df.iloc[:n_valid]
+
+
+def _pad_to_whole_year(df: pd.DataFrame, year, freq) -> pd.DataFrame:
+    """Returns part-year data forward-filled to the whole year."""
+    n_steps = len(hp.make_datetimeindex(year=year, freq=freq))
+    if len(df) < n_steps:
+        df = df.reindex(range(n_steps)).ffill()
+    return df
+
+
 def _make_emissions(year, freq, country, method, **mo_kwargs) -> pd.DataFrame:
     config = dict(year=year, freq=freq, country=country)
 
@@ -93,6 +283,144 @@ def _make_emissions(year, freq, country, method, **mo_kwargs) -> pd.DataFrame:
         raise ValueError(f"Method {method} not implemented.")
 
 
+def get_emissions_sweep(
+    year: int,
+    carbon_prices: Iterable[float],
+    freq: str = "60min",
+    country: str = "DE",
+    method: str = "_PWL",
+    **mo_kwargs,
+) -> pd.DataFrame:
+    """Returns dynamic carbon emission factors in gCO2eq/kWh_el for several carbon prices.
+
+    The carbon price independent part of the merit order (power plant list, fuel prices,
+    efficiencies, discretization) and the residual load are only prepared once. Only the sorting
+    of the merit order and its dispatch are repeated for each carbon price. E.g. for 100 carbon
+    prices (2019, DE, 60min, '_PWL') this is about 70 times faster than looping over
+    `get_emissions(..., cache=False, overwrite_carbon_tax=carbon_price)`.
+
+    Args:
+        year: Year
+        carbon_prices: Carbon prices in €/t.
+        freq: Frequency, e.g. '60min' or '15min'
+        country: alpha-2 country code, e.g. 'DE'
+        method: One of the `get_emissions` methods based on a merit order, i.e. 'XEF_PP',
+            'XEF_PWL', 'XEF_PWLv', 'MEF_PP', 'MEF_PWL', 'MEF_PWLv', '_PP', '_PWL', '_PWLv'.
+            For 'XEF_*' and 'MEF_*' a DataFrame with one column per carbon price is returned.
+            For '_PP', '_PWL', '_PWLv' the extended data of all carbon prices are returned with a
+            column MultiIndex (carbon_price, column). The marginal costs are the prices.
+        **mo_kwargs: Keyword arguments for merit order creation except 'overwrite_carbon_tax'.
+    """
+    first_method_part, last_method_part = method.split("_")
+
+    if last_method_part == "PP":
+        assert country == "DE", f"PP-method only works for Germany and not for {country}"
+        module = elmada.from_opsd
+        mo_base = module.merit_order_base(year=year, **mo_kwargs)
+    elif last_method_part in ["PWL", "PWLv"]:
+        is_vmode = bool(last_method_part == "PWLv")
+        module = elmada.eu_pwl
+        mo_base = module.merit_order_base(
+            year=year, country=country, validation_mode=is_vmode, **mo_kwargs
+        )
+    else:
+        raise ValueError(f"Method {method} is not based on a merit order.")
+
+    mo_Ps = {
+        cp: MeritOrder.from_frame(module.apply_carbon_price(mo_base, carbon_price=cp))
+        for cp in carbon_prices
+    }
+    df = elmada.from_opsd.get_CEFs_from_merit_orders(
+        mo_Ps=mo_Ps, year=year, freq=freq, country=country
+    )
+    df.columns.names = ["carbon_price", None]
+
+    if first_method_part in ("XEF", "MEF"):
+        return df.xs(first_method_part + "s", axis=1, level=1)
+    else:
+        return df
+
+
+def get_emissions_batch(
+    years: Iterable[int] = range(2017, 2021),
+    countries: Optional[Iterable[str]] = None,
+    methods: Iterable[str] = ("XEF_PWL",),
+    freq: str = "60min",
+    max_workers: Optional[int] = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """Returns carbon emission factors for all combinations of years, countries, and methods.
+
+    The combinations are computed in a process pool. A failing combination, e.g. due to a
+    `NoDataError`, does not abort the batch: it is logged and listed in
+    `panel.attrs["failures"]` as {(year, country, method): error message}.
+
+    Args:
+        years: Years
+        countries: alpha-2 country codes. If None, `mappings.COUNTRIES_FOR_ANALYSIS` are used.
+        methods: Methods as in `get_emissions`.
+        freq: Frequency, e.g. '60min' or '15min'
+        max_workers: Maximum number of worker processes. If 1, the combinations are computed in
+            the current process.
+        **kwargs: Keyword arguments for `get_emissions`, e.g. 'cache' or 'use_datetime'.
+
+    Returns:
+        Tidy DataFrame with the index levels (year, country, method, t). Series results, e.g. from
+        'XEF_PWL', are in the column 'value'. Extended results, e.g. from '_PWL', keep their
+        columns.
+    """
+    if countries is None:
+        countries = list(mp.COUNTRIES_FOR_ANALYSIS)
+    items = [
+        dict(
+            year=year,
+            country=country,
+            method=method,
+            freq=freq,
+            config=elmada.mode.get_config(),
+            **kwargs,
+        )
+        for year, country, method in itertools.product(years, countries, methods)
+    ]
+
+    if max_workers == 1:
+        results = [_get_emissions_item(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_get_emissions_item, items))
+
+    d = {}
+    failures = {}
+    for item, (data, error) in zip(items, results):
+        key = (item["year"], item["country"], item["method"])
+        if error is None:
+            d[key] = data.rename("value").to_frame() if isinstance(data, pd.Series) else data
+        else:
+            logger.warning(f"get_emissions failed for {key}: {error}")
+            failures[key] = error
+
+    if d:
+        panel = pd.concat(d, names=["year", "country", "method", "t"])
+    else:
+        panel = pd.DataFrame(
+            index=pd.MultiIndex.from_tuples([], names=["year", "country", "method", "t"])
+        )
+    panel.attrs["failures"] = failures
+    return panel
+
+
+def _get_emissions_item(
+    item: Dict,
+) -> Tuple[Optional[Union[pd.Series, pd.DataFrame]], Optional[str]]:
+    """Returns the result of `get_emissions` for a batch item and None, or None and the error."""
+    item = item.copy()
+    elmada.mode.set_config(item.pop("config"))
+    try:
+        return get_emissions(**item), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
 def get_prices(
     year: int,
     freq: str = "60min",
@@ -125,14 +453,12 @@ def get_prices(
         - (2018, DE, entsoe)-prices: data missing from Sep 30th
     """
 
-    # >> Workaround due to missing data for DE
-    if year in [2015, 2018] and country == "DE" and method == "hist_EP":
+    if method != _get_price_method(year=year, country=country, method=method):
         method = "hist_SM"
         logger.warning(
             f"The requested entsoe-data ({year}, {country}) is not complete. "
             f"Smard-data is given to you instead."
         )
-    # <<
 
     config = dict(year=year, freq=freq, country=country, cache=cache)
 
@@ -147,9 +473,18 @@ def get_prices(
         raise ValueError(f"Method '{method}' not implemented.")
 
 
+def _get_price_method(year: int, country: str, method: str) -> str:
+    """Returns the price method actually used by `get_prices`."""
+    # >> Workaround due to missing data for DE
+    if year in [2015, 2018] and country == "DE" and method == "hist_EP":
+        return "hist_SM"
+    # <<
+    return method
+
+
 def get_merit_order(
-    year: int, country: str = "DE", method: str = "PP", **mo_kwargs
-) -> pd.DataFrame:
+    year: int, country: str = "DE", method: str = "PP", compact: bool = False, **mo_kwargs
+) -> Union[pd.DataFrame, MeritOrder]:
     """Returns the merit order as DataFrame.
 
     Args:
@@ -157,8 +492,13 @@ def get_merit_order(
         country: alpha-2 country code, e.g. 'DE'
         method: One of 'PP' (power plant method), 'PWL' (piecewise
             linear method), 'PWLv' (piecewise linear method in validation mode).
+        compact: If True, a `MeritOrder` with only the dispatch-relevant arrays is returned.
         **mo_kwargs: keyword arguments for merit order function depending on `method`.
     """
+    if compact:
+        return MeritOrder.from_frame(
+            get_merit_order(year=year, country=country, method=method, **mo_kwargs)
+        )
     if method == "PP":
         assert country == "DE", f"PP-method only works for Germany and not for {country}"
         return elmada.from_opsd.merit_order(year=year, **mo_kwargs)
@@ -0,0 +1,295 @@
+"""SQLite manifest of the files in the cache directory.
+
+Every `helper.write` to `paths.CACHE_DIR` is recorded with its parameters, size, creation and
+last-access time, source, and data mode. Reads from disk update the last-access time at most
+every `ACCESS_UPDATE_INTERVAL` seconds. If a disk quota is set with `set_quota`, the least
+recently used entries are evicted after each write.
+
+The manifest uses SQLite's default rollback journal, since the write-ahead log does not work on
+network file systems, which can hold a cache shared by several hosts.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from elmada import paths
+from elmada.mode import get_mode
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARN)
+
+ACCESS_UPDATE_INTERVAL = 60  # seconds
+
+COLUMNS = ["name", "params", "size", "created", "last_access", "source", "mode"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    name TEXT PRIMARY KEY,
+    params TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    source TEXT,
+    mode TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+_LOCAL = threading.local()
+
+# times of the last recorded access per cache file of this process:
+_RECORDED_ACCESSES: Dict[Path, float] = {}
+
+
+def get_db_fp() -> Path:
+    return paths.CACHE_DIR / paths.MANIFEST_NAME
+
+
+def _connect() -> sqlite3.Connection:
+    """Returns a connection to the manifest, which is reused per thread and process."""
+    fp = get_db_fp()
+    key = (os.getpid(), fp)
+    conn = getattr(_LOCAL, "connections", {}).get(key)
+    if conn is None or not fp.exists():
+        conn = sqlite3.connect(fp, timeout=30, isolation_level=None)
+        conn.executescript(_SCHEMA)
+        if not hasattr(_LOCAL, "connections"):
+            _LOCAL.connections = {}
+        _LOCAL.connections[key] = conn
+    return conn
+
+
+def is_managed(fp: Path) -> bool:
+    """Returns if `fp` is a file directly in the cache directory other than the manifest and
+    hidden temporary and lock files.
+    """
+    return fp.parent == paths.CACHE_DIR and not fp.name.startswith((paths.MANIFEST_NAME, "."))
+
+
+def record_write(
+    fp: Path, params: Optional[Dict[str, Any]] = None, source: Optional[str] = None
+) -> None:
+    """Records a written cache file and evicts least recently used entries if the quota is
+    exceeded. The just written file is never evicted.
+    """
+    now = time.time()
+    try:
+        with _connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    fp.name,
+                    None if params is None else json.dumps(params, sort_keys=True, default=repr),
+                    fp.stat().st_size,
+                    now,
+                    now,
+                    source,
+                    get_mode(),
+                ),
+            )
+            quota = _get_quota(conn)
+            if quota is not None:
+                _evict(conn, quota, keep=fp.name)
+    except sqlite3.Error as e:
+        # the manifest must not break caching
+        logger.warning(f"Could not record {fp.name} in the cache manifest: {e}")
+
+
+def record_access(fp: Path) -> None:
+    """Records the access of a cache file unless it was recorded less than
+    `ACCESS_UPDATE_INTERVAL` seconds ago, so that frequent reads do not write the manifest.
+    """
+    now = time.time()
+    if now - _RECORDED_ACCESSES.get(fp, 0.0) < ACCESS_UPDATE_INTERVAL:
+        return
+    _RECORDED_ACCESSES[fp] = now
+    try:
+        with _connect() as conn:
+            # other processes could have recorded an access recently, too:
+            conn.execute(
+                "UPDATE entries SET last_access = ? WHERE name = ? AND last_access < ?",
+                (now, fp.name, now - ACCESS_UPDATE_INTERVAL),
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record the access of {fp.name} in the cache manifest: {e}")
+
+
+def get_params(fp: Path) -> Optional[Dict[str, Any]]:
+    """Returns the recorded parameters of a cache file or None."""
+    try:
+        with _connect() as conn:
+            row = conn.execute("SELECT params FROM entries WHERE name = ?", (fp.name,)).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read the parameters of {fp.name} from the cache manifest: {e}")
+        return None
+    return None if row is None or row[0] is None else json.loads(row[0])
+
+
+def get_caller(depth: int = 1) -> str:
+    """Returns 'module.function' of the function `depth` frames above the calling function."""
+    frame = sys._getframe(depth + 1)
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+def set_quota(max_bytes: Optional[int]) -> None:
+    """Sets the disk quota of the recorded cache files in bytes. None removes the quota.
+
+    The quota is stored in the manifest and applies to all processes that use the cache.
+    """
+    with _connect() as conn:
+        if max_bytes is None:
+            conn.execute("DELETE FROM settings WHERE key = 'quota'")
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO settings VALUES ('quota', ?)", (str(int(max_bytes)),)
+            )
+            _evict(conn, int(max_bytes))
+
+
+def get_quota() -> Optional[int]:
+    with _connect() as conn:
+        return _get_quota(conn)
+
+
+def _get_quota(conn: sqlite3.Connection) -> Optional[int]:
+    row = conn.execute("SELECT value FROM settings WHERE key = 'quota'").fetchone()
+    return None if row is None else int(row[0])
+
+
+def _evict(conn: sqlite3.Connection, max_bytes: int, keep: Optional[str] = None) -> None:
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total <= max_bytes:
+        return
+    rows = conn.execute(
+        "SELECT name, size FROM entries WHERE name IS NOT ? ORDER BY last_access", (keep,)
+    ).fetchall()
+    evicted = []
+    for name, size in rows:
+        if total <= max_bytes:
+            break
+        _unlink(paths.CACHE_DIR / name)
+        evicted.append(name)
+        total -= size
+    _delete_rows(conn, evicted)
+    logger.info(f"Evicted {len(evicted)} cache files to meet the quota of {max_bytes} bytes.")
+
+
+def query(
+    pattern: Optional[str] = None,
+    source: Optional[str] = None,
+    mode: Optional[str] = None,
+    accessed_before: Optional[float] = None,
+) -> pd.DataFrame:
+    """Returns the recorded cache entries, least recently used first.
+
+    Args:
+        pattern: SQL LIKE pattern for the file name, e.g. '%_CEFs_%'.
+        source: Source that wrote the entries, e.g. 'elmada.main.get_emissions'.
+        mode: Data mode, i.e. 'safe' or 'live'.
+        accessed_before: Unix timestamp. Only entries last accessed before are returned.
+
+    Returns:
+        DataFrame with the columns `COLUMNS`. The parameters are decoded from JSON, the times
+        are timestamps.
+    """
+    where, args = _make_where_clause(pattern, source, mode, accessed_before)
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM entries{where} ORDER BY last_access", args
+        ).fetchall()
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df["params"] = [None if p is None else json.loads(p) for p in df["params"]]
+    for col in ["created", "last_access"]:
+        df[col] = pd.to_datetime(df[col], unit="s")
+    return df
+
+
+def purge(
+    pattern: Optional[str] = None,
+    source: Optional[str] = None,
+    mode: Optional[str] = None,
+    accessed_before: Optional[float] = None,
+) -> int:
+    """Deletes the matching cache files without confirmation and returns their number.
+
+    The arguments are the same as for `query`. Without arguments, all recorded files are
+    deleted.
+    """
+    where, args = _make_where_clause(pattern, source, mode, accessed_before)
+    with _connect() as conn:
+        names = [row[0] for row in conn.execute(f"SELECT name FROM entries{where}", args)]
+        for name in names:
+            _unlink(paths.CACHE_DIR / name)
+        _delete_rows(conn, names)
+    return len(names)
+
+
+def forget(fps: Iterable[Path]) -> None:
+    """Removes entries from the manifest without deleting their files."""
+    with _connect() as conn:
+        _delete_rows(conn, [fp.name for fp in fps])
+
+
+def get_size() -> int:
+    """Returns the total size of the recorded cache files in bytes."""
+    with _connect() as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def sync() -> None:
+    """Records cache files that are missing in the manifest, e.g. from older versions, and
+    removes entries of deleted files.
+    """
+    with _connect() as conn:
+        names = {row[0] for row in conn.execute("SELECT name FROM entries")}
+        existing = {fp.name: fp for fp in paths.CACHE_DIR.iterdir() if fp.is_file()}
+        _delete_rows(conn, [name for name in names if name not in existing])
+        for name, fp in existing.items():
+            if name not in names and is_managed(fp):
+                stat = fp.stat()
+                conn.execute(
+                    "INSERT INTO entries VALUES (?, NULL, ?, ?, ?, NULL, NULL)",
+                    (name, stat.st_size, stat.st_mtime, stat.st_atime),
+                )
+
+
+def _make_where_clause(
+    pattern: Optional[str],
+    source: Optional[str],
+    mode: Optional[str],
+    accessed_before: Optional[float],
+):
+    conditions, args = [], []
+    for condition, arg in [
+        ("name LIKE ?", pattern),
+        ("source = ?", source),
+        ("mode = ?", mode),
+        ("last_access < ?", accessed_before),
+    ]:
+        if arg is not None:
+            conditions.append(condition)
+            args.append(arg)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, args
+
+
+def _delete_rows(conn: sqlite3.Connection, names: List[str]) -> None:
+    conn.executemany("DELETE FROM entries WHERE name = ?", [(name,) for name in names])
+
+
+def _unlink(fp: Path) -> None:
+    try:
+        os.remove(fp)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,73 @@
+"""Compact array-backed merit order."""
+
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+ARRAY_COLUMNS = ("capa", "cumsum_capa", "used_eff", "marginal_cost", "marginal_emissions")
+
+
+class MeritOrder:
+    """Merit order held as contiguous NumPy arrays sorted by marginal cost.
+
+    Only the data needed for the dispatch are kept: `capa` and `cumsum_capa` in MW, `used_eff`,
+    `marginal_cost` in €/MWh_el, `marginal_emissions` in t_CO2eq/MWh_el, and the fuel type of
+    each power plant as integer code into `fuels`. Use `to_frame()` to get a DataFrame with the
+    column names of the merit-order DataFrames.
+    """
+
+    __slots__ = ARRAY_COLUMNS + ("fuel_codes", "fuels")
+
+    def __init__(
+        self,
+        capa: np.ndarray,
+        used_eff: np.ndarray,
+        marginal_cost: np.ndarray,
+        marginal_emissions: np.ndarray,
+        fuel_codes: np.ndarray,
+        fuels: Sequence[str],
+        cumsum_capa: np.ndarray = None,
+    ):
+        self.capa = np.ascontiguousarray(capa, dtype=float)
+        self.cumsum_capa = np.ascontiguousarray(
+            np.cumsum(self.capa) if cumsum_capa is None else cumsum_capa, dtype=float
+        )
+        self.used_eff = np.ascontiguousarray(used_eff, dtype=float)
+        self.marginal_cost = np.ascontiguousarray(marginal_cost, dtype=float)
+        self.marginal_emissions = np.ascontiguousarray(marginal_emissions, dtype=float)
+        self.fuel_codes = np.ascontiguousarray(fuel_codes, dtype=np.int8)
+        self.fuels: Tuple[str, ...] = tuple(fuels)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "MeritOrder":
+        """Returns a MeritOrder from a merit-order DataFrame, e.g. from `get_merit_order`."""
+        fuel_cat = pd.Categorical(df["fuel_draf"])
+        return cls(
+            capa=df["capa"].values,
+            cumsum_capa=df["cumsum_capa"].values,
+            used_eff=df["used_eff"].values,
+            marginal_cost=df["marginal_cost"].values,
+            marginal_emissions=df["marginal_emissions"].values,
+            fuel_codes=fuel_cat.codes,
+            fuels=fuel_cat.categories,
+        )
+
+    def fuel_names(self, idx: Union[np.ndarray, slice] = slice(None)) -> np.ndarray:
+        """Returns the fuel types of the power plants at positions `idx` as object array."""
+        # the appended NaN is addressed by the code -1 of missing fuel types:
+        names = np.array(list(self.fuels) + [np.nan], dtype=object)
+        return names[self.fuel_codes[idx]]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns the merit order as DataFrame."""
+        df = pd.DataFrame({"fuel_draf": self.fuel_names()})
+        for col in ARRAY_COLUMNS:
+            df[col] = getattr(self, col)
+        return df
+
+    def __len__(self) -> int:
+        return len(self.capa)
+
+    def __repr__(self) -> str:
+        return f"MeritOrder({len(self)} power plants, {self.capa.sum():.0f} MW, {self.fuels})"
@@ -1,5 +1,24 @@
+from typing import Any, Dict
+
+
 class ConfigUtil:
     mode = "safe"
+    dtype_policy = "default"
+    cef_cache_suffix = ".feather"
+    stand_in_url = None
+
+
+def get_config() -> Dict[str, Any]:
+    """Returns a snapshot of all settings, e.g. to restore them in worker processes, which do
+    not inherit them under the spawn start method.
+    """
+    return {k: v for k, v in vars(ConfigUtil).items() if not k.startswith("_")}
+
+
+def set_config(config: Dict[str, Any]) -> None:
+    """Restores the settings of a snapshot of `get_config`."""
+    for key, value in config.items():
+        setattr(ConfigUtil, key, value)
 
 
 def set_mode(mode: str):
@@ -14,3 +33,22 @@ def get_mode() -> str:
 
 def is_safe_mode() -> bool:
     return get_mode() == "safe"
+
+
+def set_dtype_policy(dtype_policy: str):
+    """Set dtype policy either to 'default' or to 'compact'.
+
+    With 'compact', generation data are float32, the column 'marginal_fuel' of the extended
+    emission data is categorical, and MEFs and XEFs are rounded to `helper.CEF_DECIMALS`
+    decimals and cached as fixed-point integers.
+    """
+    assert dtype_policy in ["default", "compact"]
+    ConfigUtil.dtype_policy = dtype_policy
+
+
+def get_dtype_policy() -> str:
+    return ConfigUtil.dtype_policy
+
+
+def is_compact_dtype_policy() -> bool:
+    return get_dtype_policy() == "compact"
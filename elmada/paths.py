@@ -1,5 +1,6 @@
+import re
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from appdirs import user_cache_dir, user_config_dir
 
@@ -26,9 +27,35 @@ CACHE_DIR = _get_cache_directory()
 KEYS_DIR = _get_config_directory()
 DATA_DIR = BASE_DIR / "data/raw"
 SAFE_CACHE_DIR = BASE_DIR / "data/safe_cache"
+MANIFEST_NAME = "manifest.sqlite"
 
 
 def mode_dependent_cache_dir(year: Optional[int] = None, country: Optional[str] = None):
     is_safe_year = year in range(2017, 2021) or year is None
     is_safe_country = country in COUNTRIES_FOR_ANALYSIS or country is None
     return SAFE_CACHE_DIR if (is_safe_mode() and is_safe_year and is_safe_country) else CACHE_DIR
+
+
+def mode_dependent_cache_fp(year: int, country: str, kind: str) -> Path:
+    """Returns the file path of ENTSO-E data of a `kind`, e.g. 'gen' or 'installedGen'."""
+    return mode_dependent_cache_dir(year, country) / f"{year}_{country}_{kind}_entsoe.parquet"
+
+
+def input_files(year: int, country: str) -> List[Path]:
+    """Returns the raw data files and the cached input files that the carbon emission factors of
+    the given year and country can depend on.
+
+    Cached files are considered if they are not specific to a year and country, e.g. the OPSD
+    power plant list, or if they are specific to the given year and country. Cached results,
+    i.e. files containing '_CEFs_', the cache manifest, and hidden temporary and lock files are
+    excluded.
+    """
+    files = [fp for fp in DATA_DIR.rglob("*") if fp.is_file()]
+    for cache_dir in {mode_dependent_cache_dir(year, country), CACHE_DIR}:
+        for fp in cache_dir.iterdir():
+            name = fp.name
+            if "_CEFs_" in name or name.startswith((MANIFEST_NAME, ".")) or not fp.is_file():
+                continue
+            if name.startswith(f"{year}_{country}_") or not re.match(r"\d{4}_", name):
+                files.append(fp)
+    return files
@@ -7,7 +7,9 @@ from matplotlib.patches import Patch
 
 from elmada import helper as hp
 from elmada import mappings as mp
-from elmada.main import get_emissions, get_merit_order, get_residual_load
+from elmada.exceptions import NoDataError
+from elmada.main import get_emissions, get_emissions_batch, get_merit_order, get_residual_load
+from elmada.merit_order import MeritOrder
 
 
 def merit_order(
@@ -17,7 +19,7 @@ def merit_order(
     ylim_left: Optional[float] = None,
     ylim_right: Optional[float] = None,
     ax: Optional["plt.axes"] = None,
-    mo_P: Optional[pd.DataFrame] = None,
+    mo_P: Optional[Union[pd.DataFrame, MeritOrder]] = None,
     include_histo: bool = False,
     include_legend: bool = True,
     legend_fontsize: float = 9,
@@ -32,7 +34,10 @@ def merit_order(
     if mo_P is None:
         mo_P = get_merit_order(year=year, country=country, method=method, **mo_kwargs)
 
-    mo_P = mo_P.copy()  # avoids modifying lru_cache
+    if isinstance(mo_P, MeritOrder):
+        mo_P = mo_P.to_frame()
+    else:
+        mo_P = mo_P.copy()  # avoids modifying lru_cache
     # the unit of mo_P.marginal_emissions is kg
     mo_P.cumsum_capa /= 1000  # from MW to GW
     mo_P.capa /= 1000  # from MW to GW
@@ -205,9 +210,13 @@ def cef_country_map(year: int = 2019, method: str = "XEF_PWL", scope: str = "Eur
     d = mp.EUROPE30 if scope == "Europe30" else mp.COUNTRIES_FOR_ANALYSIS
     df = pd.DataFrame([(k, v) for k, v in d.items()], columns=["iso_alpha2", "country"])
     df["iso_alpha3"] = df.iso_alpha2.apply(lambda x: countries.get(x).alpha3)
-    df[method] = df.iso_alpha2.apply(
-        lambda x: get_emissions(year=year, country=x, method=method).mean()
-    )
+    panel = get_emissions_batch(years=[year], countries=list(d), methods=[method])
+    if panel.empty:
+        raise NoDataError(
+            f"No {method} emissions for any country of {scope} in {year}. "
+            f"Failures: {panel.attrs['failures']}"
+        )
+    df[method] = df.iso_alpha2.map(panel["value"].groupby("country").mean())
     small_adder = _small("(unsupported countries in light blue)")
     fig = px.choropleth(
         df,
@@ -0,0 +1,210 @@
+"""Local stand-in server that records and replays the responses of the external data sources.
+
+Responses are stored in a cassette, i.e. a directory with one JSON file of metadata and one body
+file per request. Secrets in the query, e.g. the ENTSO-E security token, are not part of the
+cassette. Conditional requests whose If-None-Match header matches the recorded ETag are answered
+with 304 Not Modified.
+
+Example:
+    Record the responses of the requests of a function once:
+
+    >>> with StandInServer("cassettes/entsoe", record=True):
+    ...     elmada.from_entsoe.load_el_national_generation(2019, "DE", cache=False)
+
+    Replay them offline with 200 ms latency and 10 % HTTP 503 errors:
+
+    >>> with StandInServer("cassettes/entsoe", latency=0.2, error_rate=0.1):
+    ...     elmada.from_entsoe.load_el_national_generation(2019, "DE", cache=False)
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from elmada import web
+from elmada.mode import ConfigUtil
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARN)
+
+SECRET_PARAMS = ("securityToken", "api_key", "key")  # ENTSO-E, Quandl, Morph
+REPLAYED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def strip_secrets(url: str) -> str:
+    """Returns `url` without the query parameters in `SECRET_PARAMS`."""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+class Cassette:
+    """Directory of recorded responses addressed by method and URL without secrets."""
+
+    def __init__(self, directory: Union[Path, str]):
+        self.directory = Path(directory)
+
+    def _get_fp(self, method: str, url: str) -> Path:
+        key = hashlib.sha256(f"{method} {strip_secrets(url)}".encode()).hexdigest()[:16]
+        return self.directory / f"{key}.json"
+
+    def get(self, method: str, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """Returns the status, headers, and body of a recorded response or None."""
+        fp = self._get_fp(method, url)
+        if not fp.exists():
+            return None
+        meta = json.loads(fp.read_text())
+        return meta["status"], meta["headers"], fp.with_suffix(".body").read_bytes()
+
+    def put(self, method: str, url: str, status: int, headers: Dict[str, str], body: bytes):
+        fp = self._get_fp(method, url)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        fp.with_suffix(".body").write_bytes(body)
+        meta = dict(method=method, url=strip_secrets(url), status=status, headers=headers)
+        fp.write_text(json.dumps(meta, indent=2))
+
+
+class StandInServer:
+    """HTTP server on localhost that stands in for the external data sources.
+
+    Within its context, all requests to external sources are redirected to the server, see
+    `elmada.web`. Alternatively, other processes can be redirected with the environment
+    variable `ELMADA_STAND_IN_URL` set to `url`.
+
+    Args:
+        cassette_dir: Directory of the cassette.
+        record: If True, requests missing in the cassette are sent to the original URL and their
+            responses are recorded. If False, they are answered with HTTP 404.
+            Requests are counted in `counts` by outcome, i.e. 'replayed', 'recorded', 'missing',
+            'injected_errors', and 'upstream_errors'.
+        latency: Delay of each response in seconds.
+        error_rate: Share of the requests that are answered with `error_status` instead, e.g. to
+            test retries.
+        error_status: HTTP status code of the injected errors.
+        port: Port. If 0, a free port is chosen.
+        seed: Seed of the random error injection.
+    """
+
+    def __init__(
+        self,
+        cassette_dir: Union[Path, str],
+        record: bool = False,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.cassette = Cassette(cassette_dir)
+        self.record = record
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.counts = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+        self._previous_stand_in_url = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        self._previous_stand_in_url = ConfigUtil.stand_in_url
+        web.set_stand_in_url(self.url)
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        web.set_stand_in_url(self._previous_stand_in_url)
+        self.stop()
+
+    def respond(self, method: str, url: str) -> Tuple[int, Dict[str, str], bytes]:
+        """Returns the status, headers, and body of the response to a request of `url`."""
+        time.sleep(self.latency)
+        with self._lock:
+            is_error = self._random.random() < self.error_rate
+        if is_error:
+            self._count("injected_errors")
+            return self.error_status, {"Content-Type": "text/plain"}, b"Injected error"
+
+        recorded = self.cassette.get(method, url)
+        if recorded is not None:
+            self._count("replayed")
+            return recorded
+        if not self.record:
+            self._count("missing")
+            logger.warning(f"{method} {strip_secrets(url)} is not in the cassette.")
+            message = f"Not in cassette: {strip_secrets(url)}"
+            return 404, {"Content-Type": "text/plain"}, message.encode()
+
+        try:
+            response = requests.request(method, url, timeout=300)
+        except requests.RequestException as e:
+            self._count("upstream_errors")
+            return 502, {"Content-Type": "text/plain"}, f"{type(e).__name__}: {e}".encode()
+        headers = {k: response.headers[k] for k in REPLAYED_HEADERS if k in response.headers}
+        self.cassette.put(method, url, response.status_code, headers, response.content)
+        self._count("recorded")
+        return response.status_code, headers, response.content
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_HEAD(self):
+                self._handle("HEAD")
+
+            def _handle(self, method: str):
+                # paths are '/{scheme}/{host}/{path}?{query}', see `web.redirect`
+                scheme, _, rest = self.path.lstrip("/").partition("/")
+                status, headers, body = server.respond(method, f"{scheme}://{rest}")
+                etag = self.headers.get("If-None-Match")
+                if status == 200 and etag is not None and etag == headers.get("ETag"):
+                    status, body = 304, b""
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if method != "HEAD":
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
@@ -0,0 +1,193 @@
+"""Monte Carlo uncertainty analysis of the carbon emission factors of the PWL method."""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from elmada import eu_pwl, from_opsd, from_other
+from elmada import mappings as mp
+
+logger = logging.getLogger(__name__)
+logger.setLevel(level=logging.WARN)
+
+DEFAULT_REL_STD = dict(fuel_price=0.2, carbon_price=0.2, efficiency=0.03)
+
+
+def get_emissions_percentiles(
+    year: int = 2019,
+    freq: str = "60min",
+    country: str = "DE",
+    n_samples: int = 1000,
+    percentiles: Iterable[float] = (5, 50, 95),
+    rel_std: Optional[Dict[str, float]] = None,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    validation_mode: bool = False,
+    **mo_kwargs,
+) -> pd.DataFrame:
+    """Returns percentile bands of the PWL-based MEFs and XEFs in gCO2eq/kWh_el per timestep.
+
+    For each sample, the fuel prices (per fuel type), the ETS price, and the efficiency bounds
+    `eff_min` and `eff_max` of the PWL method (per fuel type) are multiplied with log-normal
+    distributed factors with a mean of 1. The merit orders of a chunk of samples are built as
+    2D arrays and dispatched against the same residual load. Chunks are spread across a process
+    pool.
+
+    Args:
+        year: Year
+        freq: Frequency, e.g. '60min' or '15min'
+        country: alpha-2 country code, e.g. 'DE'
+        n_samples: Number of samples.
+        percentiles: Percentiles in the range [0, 100].
+        rel_std: Relative standard deviations for the keys 'fuel_price', 'carbon_price', and
+            'efficiency'. Missing keys are taken from `DEFAULT_REL_STD`.
+        seed: Seed of the random number generator.
+        max_workers: Maximum number of worker processes. If 1, all chunks are processed in the
+            current process.
+        chunksize: Number of samples per chunk.
+        validation_mode: If the PWL method is used in validation mode.
+        **mo_kwargs: Keyword arguments for `eu_pwl.merit_order_per_fuel` and
+            `eu_pwl.discretize_merit_order_per_fuel`, i.e. 'approx_method' and 'pp_size_method'.
+
+    Returns:
+        DataFrame with a column MultiIndex (CEF type, percentile).
+    """
+    rel_std = {**DEFAULT_REL_STD, **(rel_std or {})}
+    plants, fuels, mo_f = _prep_plants(year, country, validation_mode, **mo_kwargs)
+    samples = draw_samples(
+        mo_f,
+        fuels=fuels,
+        carbon_price=from_other.get_ETS_price(year),
+        n_samples=n_samples,
+        rel_std=rel_std,
+        seed=seed,
+    )
+    resi_T, total_load_T, transm_eff = from_opsd.get_dispatch_inputs(year, freq, country)
+
+    chunks = [
+        dict(
+            plants=plants,
+            samples={k: v[i : i + chunksize] for k, v in samples.items()},
+            resi_values=resi_T.values,
+            total_load_values=total_load_T.values,
+            transm_eff=transm_eff,
+        )
+        for i in range(0, n_samples, chunksize)
+    ]
+
+    if max_workers == 1:
+        results = [_dispatch_samples(**chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_dispatch_chunk, chunks))
+
+    percentiles = list(percentiles)
+    d = {}
+    for i, cef_type in enumerate(["MEFs", "XEFs"]):
+        cefs = np.concatenate([result[i] for result in results])
+        d[cef_type] = pd.DataFrame(
+            np.percentile(cefs, percentiles, axis=0).T, index=resi_T.index, columns=percentiles
+        )
+    return pd.concat(d, axis=1, names=["cef_type", "percentile"])
+
+
+def draw_samples(
+    mo_f: pd.DataFrame,
+    fuels: List[str],
+    carbon_price: float,
+    n_samples: int,
+    rel_std: Dict[str, float],
+    seed: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Returns sampled fuel prices and efficiency bounds with shape (n_samples, number of fuels)
+    and sampled carbon prices with shape (n_samples,).
+    """
+    rng = np.random.default_rng(seed)
+    n_fuels = len(fuels)
+
+    def draw_factors(which: str, size: Union[int, Tuple[int, int]]) -> np.ndarray:
+        sigma = rel_std[which]
+        return rng.lognormal(mean=-(sigma**2) / 2, sigma=sigma, size=size)
+
+    eff_factors = draw_factors("efficiency", (n_samples, n_fuels))
+    return dict(
+        x_k=mo_f.loc[fuels, "fuel_price"].values * draw_factors("fuel_price", (n_samples, n_fuels)),
+        carbon_price=carbon_price * draw_factors("carbon_price", n_samples),
+        eff_min=np.minimum(mo_f.loc[fuels, "eff_min"].values * eff_factors, 1.0),
+        eff_max=np.minimum(mo_f.loc[fuels, "eff_max"].values * eff_factors, 1.0),
+    )
+
+
+def _prep_plants(
+    year: int,
+    country: str,
+    validation_mode: bool,
+    approx_method: str = "regr",
+    pp_size_method: str = "from_geo_scraped",
+) -> Tuple[Dict[str, np.ndarray], List[str], pd.DataFrame]:
+    """Returns the sample-independent arrays of the discretized virtual power plants."""
+    mo_f = eu_pwl.merit_order_per_fuel(
+        year=year, country=country, approx_method=approx_method, validation_mode=validation_mode
+    )
+    df = eu_pwl.discretize_merit_order_per_fuel(
+        mo_f, country=country, pp_size_method=pp_size_method
+    )
+
+    # relative position of the virtual power plant within its fuel type:
+    df["position"] = df.groupby("fuel_draf")["capa"].cumsum() / df["fuel_draf"].map(mo_f["capa"])
+    for col in ["fuel_price", "emissions_for_gen"]:
+        df[col] = df["fuel_draf"].map(mo_f[col])
+    df = df.dropna()
+
+    fuels = [f for f in mp.PWL_FUELS if f in set(df["fuel_draf"])]
+    plants = dict(
+        capa=df["capa"].values,
+        position=df["position"].values,
+        fuel_idx=df["fuel_draf"].map({f: i for i, f in enumerate(fuels)}).values,
+        emissions_per_fuel=mo_f.loc[fuels, "emissions_for_gen"].values,
+    )
+    return plants, fuels, mo_f
+
+
+def _dispatch_chunk(chunk: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    return _dispatch_samples(**chunk)
+
+
+def _dispatch_samples(
+    plants: Dict[str, np.ndarray],
+    samples: Dict[str, np.ndarray],
+    resi_values: np.ndarray,
+    total_load_values: np.ndarray,
+    transm_eff: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns MEFs and XEFs with shape (number of samples, number of timesteps)."""
+    fuel_idx = plants["fuel_idx"]
+    eff_min = samples["eff_min"][:, fuel_idx]
+    eff_max = samples["eff_max"][:, fuel_idx]
+
+    # merit orders of all samples with shape (number of samples, number of plants):
+    used_eff = eff_max - plants["position"] * (eff_max - eff_min)
+    marginal_emissions = plants["emissions_per_fuel"][fuel_idx] / used_eff
+    fuel_cost = samples["x_k"][:, fuel_idx] / used_eff
+    marginal_cost = fuel_cost + marginal_emissions * samples["carbon_price"][:, np.newaxis]
+
+    order = np.argsort(marginal_cost, axis=1, kind="stable")
+    capa = plants["capa"][order]
+    cumsum_capa = np.cumsum(capa, axis=1)
+    marginal_emissions = np.take_along_axis(marginal_emissions, order, axis=1)
+
+    marginal_idx = from_opsd.get_marginal_plant_indices(cumsum_capa, resi_values)
+    emissions = from_opsd.get_emissions_at_residual_load(
+        cumsum_capa=cumsum_capa,
+        capa=capa,
+        marginal_emissions=marginal_emissions,
+        resi_values=resi_values,
+        marginal_idx=marginal_idx,
+    )
+    mefs = np.take_along_axis(marginal_emissions, marginal_idx, axis=1) / transm_eff * 1000
+    xefs = emissions / total_load_values / transm_eff * 1000
+    return mefs.astype(np.float32), xefs.astype(np.float32)
@@ -0,0 +1,155 @@
+"""HTTP access to the external data sources.
+
+All requests to external sources go through this module. If a stand-in URL is set with
+`set_stand_in_url` or the environment variable `ELMADA_STAND_IN_URL`, they are redirected to a
+local stand-in server, see `elmada.replay`. E.g. 'https://morph.io/x?y=1' becomes
+'{stand_in_url}/https/morph.io/x?y=1'.
+
+Requests share pooled sessions, so that consecutive requests to a host reuse keep-alive
+connections. Bulk files are streamed to disk with `download`, which revalidates existing files
+with conditional requests.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from elmada.mode import ConfigUtil
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARN)
+
+STAND_IN_URL_ENV = "ELMADA_STAND_IN_URL"
+
+BASE_URLS = {
+    "entsoe": "https://web-api.tp.entsoe.eu/api",  # requested by entsoe-py
+    "geo": "http://globalenergyobservatory.org/",
+    "morph": "https://morph.io/",
+    "opsd": "https://data.open-power-system-data.org/",
+    "quandl": "https://data.nasdaq.com/api/v3",
+    "wikipedia_de": "https://de.wikipedia.org/",
+    "wikipedia_en": "https://en.wikipedia.org/",
+}
+POOL_MAXSIZE = 32  # connections kept alive per host, i.e. >= concurrent threads per session
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+DOWNLOAD_TIMEOUT = 300
+
+_local = threading.local()
+
+
+def set_stand_in_url(url: Optional[str]) -> None:
+    """Redirects all requests to external sources to a stand-in server, e.g.
+    'http://127.0.0.1:8765'. None removes the redirection.
+    """
+    ConfigUtil.stand_in_url = None if url is None else url.rstrip("/")
+
+
+def get_stand_in_url() -> Optional[str]:
+    if ConfigUtil.stand_in_url is not None:
+        return ConfigUtil.stand_in_url
+    url = os.environ.get(STAND_IN_URL_ENV)
+    return url.rstrip("/") if url else None
+
+
+def redirect(url: str) -> str:
+    """Returns the URL under which `url` is requested, i.e. at the stand-in server if set."""
+    stand_in_url = get_stand_in_url()
+    if stand_in_url is None or url.startswith(stand_in_url):
+        return url
+    parts = urlsplit(url)
+    return f"{stand_in_url}/{parts.scheme}/{parts.netloc}{parts.path or '/'}" + (
+        f"?{parts.query}" if parts.query else ""
+    )
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Sends a GET request to `url` or to its stand-in with the pooled session of `get_session`."""
+    return get_session().get(url, **kwargs)
+
+
+def download(url: str, fp: Union[Path, str], chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> bool:
+    """Streams the body of `url` to `fp` and returns whether `fp` was (re)written.
+
+    The ETag and Last-Modified headers of the response are stored next to `fp` in a hidden
+    file. If `fp` was downloaded from `url` before, the request is conditional: if the source
+    answers 304 Not Modified, `fp` is kept and False is returned.
+    """
+    fp = Path(fp)
+    fp.parent.mkdir(parents=True, exist_ok=True)
+    validators_fp = fp.parent / f".{fp.name}.http.json"
+    # the URL may contain an API key, so only its hash is stored:
+    url_hash = hashlib.sha256(url.encode()).hexdigest()
+
+    headers = {}
+    if fp.exists() and validators_fp.exists():
+        validators = json.loads(validators_fp.read_text())
+        if validators.get("url_hash") == url_hash:
+            if validators.get("ETag"):
+                headers["If-None-Match"] = validators["ETag"]
+            if validators.get("Last-Modified"):
+                headers["If-Modified-Since"] = validators["Last-Modified"]
+
+    with get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status_code == 304:
+            logger.info(f"{fp.name} is up to date.")
+            return False
+        response.raise_for_status()
+
+        # readers never see half-written files, since the file is replaced atomically:
+        tmp_fp = fp.parent / f".{fp.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_fp, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            os.replace(tmp_fp, fp)
+        finally:
+            if tmp_fp.exists():
+                tmp_fp.unlink()
+
+        validators = {k: response.headers.get(k) for k in ("ETag", "Last-Modified")}
+        validators_fp.write_text(json.dumps(dict(url_hash=url_hash, **validators)))
+    return True
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Transport adapter that redirects the requests of a session, e.g. of a third-party client,
+    to the stand-in server if set.
+    """
+
+    def send(self, request, **kwargs):
+        request.url = redirect(request.url)
+        return super().send(request, **kwargs)
+
+
+def make_session(pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    """Returns a session whose requests are redirected to the stand-in server if set.
+
+    Up to `pool_maxsize` connections per host are kept alive, e.g. for a third-party client
+    that is used by several threads.
+    """
+    session = requests.Session()
+    adapter = RedirectAdapter(pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the pooled session of the current thread, see `make_session`.
+
+    Sessions are not shared between threads and processes, since they are not thread-safe and
+    their connections must not be inherited by forked processes.
+    """
+    session = getattr(_local, "session", None)
+    if session is None or _local.pid != os.getpid():
+        _local.session, _local.pid = make_session(), os.getpid()
+    return _local.session
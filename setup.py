@@ -44,6 +44,7 @@ setup(
             "pytest",
         ]
     },
+    entry_points={"console_scripts": ["elmada=elmada.cli:main"]},
     include_package_data=True,
     package_data={"elmada": ["*.parquet", "*.csv", "*.txt", "*xls"]},
     classifiers=[
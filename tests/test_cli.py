@@ -0,0 +1,69 @@
+import pytest
+
+from elmada import cli
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ["2019", [2019]],
+        ["2017-2020", [2017, 2018, 2019, 2020]],
+        ["2015,2017-2018", [2015, 2017, 2018]],
+    ],
+)
+def test_parse_years(s, expected):
+    assert cli.parse_years(s) == expected
+
+
+def test_make_tasks():
+    args = dict(
+        years=[2019], countries=["DE", "FR"], methods=["XEF_PWL", "MEF_PWL", "MEF_PP", "hist_EP"]
+    )
+    assert cli.make_tasks("generation", freqs=["60min"], **args) == [
+        dict(stage="generation", year=2019, country="DE"),
+        dict(stage="generation", year=2019, country="FR"),
+    ]
+    tasks = cli.make_tasks("emissions", freqs=["60min", "15min"], **args)
+    assert [(t["country"], t["freq"], t["method"]) for t in tasks] == [
+        ("DE", "60min", "PP"),
+        ("DE", "60min", "PWL"),
+        ("DE", "15min", "PP"),
+        ("DE", "15min", "PWL"),
+        ("FR", "60min", "PWL"),
+        ("FR", "15min", "PWL"),
+    ]
+    tasks = cli.make_tasks("prices", freqs=["60min"], **dict(args, years=[2018]))
+    assert [(t["country"], t["method"]) for t in tasks] == [("DE", "hist_SM"), ("FR", "hist_EP")]
+
+
+def test_warm(mocker, tmp_path, capsys):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch(
+        "elmada.cli.get_cache_fp", side_effect=lambda task: tmp_path / cli._get_label(task)
+    )
+    (tmp_path / "generation 2019 DE").touch()
+
+    def fake_get_emissions(year, country, freq, method):
+        if country == "XX":
+            raise ValueError("no data")
+        (tmp_path / f"emissions {year} {country} {freq} {method[1:]}").touch()
+
+    mocker.patch("elmada.from_entsoe.load_el_national_generation")
+    mocker.patch("elmada.main.get_emissions", side_effect=fake_get_emissions)
+
+    summary = cli.warm(years=[2019], countries=["DE", "XX"], methods=["XEF_PWL"], jobs=1)
+    assert summary == dict(
+        hits=["generation 2019 DE"],
+        fetched=["generation 2019 XX", "emissions 2019 DE 60min PWL"],
+        failed=["emissions 2019 XX 60min PWL: ValueError: no data"],
+    )
+    assert "[emissions 2/2] emissions 2019 XX 60min PWL: failed" in capsys.readouterr().out
+
+
+def test_main(mocker, capsys):
+    mock = mocker.patch("elmada.cli.warm", return_value=dict(hits=["a"], fetched=[], failed=[]))
+    assert cli.main(["warm", "--years", "2019-2020", "--countries", "DE", "--jobs", "2"]) == 0
+    mock.assert_called_once_with(
+        years=[2019, 2020], countries=["DE"], methods=["XEF_PWL"], freqs=["60min"], jobs=2
+    )
+    assert "Summary: 1 hits, 0 fetched, 0 failed." in capsys.readouterr().out
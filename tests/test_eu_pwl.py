@@ -41,3 +41,9 @@ def test_get_pp_size():
 def test_get_pp_sizes_from_germany():
     result = eu_pwl.get_pp_sizes_from_germany()
     assert isinstance(result, pd.Series)
+
+
+def test_prep_CEFs_for_scenarios(mocker):
+    mock = mocker.patch("elmada.from_opsd.get_CEFs_from_merit_orders")
+    eu_pwl.prep_CEFs_for_scenarios(scenarios={"a": {}, "b": dict(overwrite_carbon_tax=80)})
+    assert list(mock.call_args.kwargs["mo_Ps"]) == ["a", "b"]
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from elmada import fetch
+
+
+def test_fetch_inputs(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.fetch.get_cache_fp", side_effect=lambda k, y, c, f: tmp_path / c)
+    (tmp_path / "DE").touch()
+
+    def load(kind, year, country, freq):
+        time.sleep(0.2)
+        if country == "XX":
+            raise ValueError("no data")
+
+    mock = mocker.patch("elmada.fetch.load", side_effect=load)
+    start = time.perf_counter()
+    summary = fetch.fetch_inputs(
+        years=[2019, 2020], countries=["DE", "FR", "PL", "XX"], kinds=["gen", "prices"]
+    )
+    assert time.perf_counter() - start < 1.0  # 12 loads of 0.2 s each run concurrently
+    assert mock.call_count == 12
+    assert sorted(summary["hits"]) == [
+        "gen 2019 DE",
+        "gen 2020 DE",
+        "prices 2019 DE",
+        "prices 2020 DE",
+    ]
+    assert len(summary["fetched"]) == 8
+    assert "gen 2019 XX: ValueError: no data" in summary["failed"]
+
+    with pytest.raises(ValueError):
+        fetch.fetch_inputs(years=[2019], countries=["DE"], kinds=["spam"])
+
+
+def test_fetch_inputs_concurrency_limit(mocker):
+    mocker.patch("elmada.fetch.get_cache_fp", return_value=mocker.Mock(exists=lambda: False))
+    mocker.patch("elmada.fetch.load", side_effect=lambda *args: time.sleep(0.1))
+    start = time.perf_counter()
+    summary = fetch.fetch_inputs(
+        years=[2019], countries=["DE", "FR", "PL", "AT"], max_concurrency=2
+    )
+    assert len(summary["fetched"]) == 12
+    assert time.perf_counter() - start >= 0.6
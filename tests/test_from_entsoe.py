@@ -1,7 +1,13 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 import pytest
+import requests
 from entsoe import EntsoePandasClient
+from entsoe.exceptions import NoMatchingDataError
 
 from elmada import exceptions, from_entsoe
 from elmada import helper as hp
@@ -100,7 +106,7 @@ def test_get_renewable_generation():
 
 @pytest.mark.apikey
 def test_load_el_national_generation(mocker):
-    df = hp.read(paths.SAFE_CACHE_DIR / "2019_DE_gen_entsoe.parquet")
+    df = hp.read(paths.mode_dependent_cache_fp(2019, "DE", kind="gen"))
     mock = mocker.patch("entsoe.EntsoePandasClient.query_generation", return_value=df)
     result = from_entsoe.load_el_national_generation(
         year=2019, country="DE", freq="15min", cache=False, split_queries=False
@@ -109,6 +115,22 @@ def test_load_el_national_generation(mocker):
     assert isinstance(result, pd.DataFrame)
 
 
+@pytest.mark.parametrize("year,country", [(2019, "DE"), (2019, "DK"), (2018, "LT")])
+def test_load_el_national_generation_with_fuels(year, country):
+    full = from_entsoe.load_el_national_generation(year=year, country=country, freq="60min")
+    for fuels in [mp.CONV, mp.RES, ["other_conv"]]:
+        result = from_entsoe.load_el_national_generation(
+            year=year, country=country, freq="60min", fuels=fuels
+        )
+        assert result.equals(full[[f for f in full.keys() if f in fuels]])
+
+
+def test_get_raw_generation_columns():
+    columns = ["Fossil Gas", "Fossil Coal-derived gas", "Solar", "Nuclear"]
+    result = from_entsoe.get_raw_generation_columns(columns, fuels=["gas"])
+    assert result == ["Fossil Gas"]
+
+
 def test_get_bidding_zone():
     assert from_entsoe.get_bidding_zone(country="AT", year=2017) == "DE-AT-LU"
 
@@ -122,7 +144,8 @@ def test_query_day_ahead_prices(mocker):
     mock.assert_called_once()
 
 
-def test__query_generation(mocker):
+def test__query_generation(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
     mocker.patch("elmada.from_entsoe._get_client", return_value=EntsoePandasClient)
     mock = mocker.patch("entsoe.EntsoePandasClient.query_generation", return_value=pd.DataFrame())
     from_entsoe._query_generation(year=2019, country="DE", split_queries=False)
@@ -131,3 +154,114 @@ def test__query_generation(mocker):
     mock = mocker.patch("entsoe.EntsoePandasClient.query_generation", return_value=pd.DataFrame())
     from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
     assert mock.call_count == 12
+
+
+def test__query_generation_chunked(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+
+    def query_generation(start, end, country_code):
+        time.sleep(0.05 * (12 - start.month))  # later months are returned first
+        return pd.DataFrame({"Nuclear": [start.month]}, index=[start])
+
+    mocker.patch("elmada.from_entsoe._get_client", return_value=EntsoePandasClient)
+    mocker.patch("entsoe.EntsoePandasClient.query_generation", side_effect=query_generation)
+    df = from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
+    assert df["Nuclear"].tolist() == list(range(1, 13))
+
+    mocker.patch("elmada.from_entsoe.QUERY_CHUNK_FREQ", "7D")
+    mock = mocker.patch("entsoe.EntsoePandasClient.query_generation", return_value=pd.DataFrame())
+    from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
+    assert mock.call_count == 53
+
+
+def test__query_generation_chunked_uses_a_session_per_thread(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.helper.get_api_key", return_value="key")
+    sessions = {}
+
+    def query_generation(self, start, end, country_code):
+        time.sleep(0.01)
+        sessions.setdefault(threading.get_ident(), set()).add(id(self.session))
+        return pd.DataFrame({"Nuclear": [start.month]}, index=[start])
+
+    mocker.patch(
+        "entsoe.EntsoePandasClient.query_generation", side_effect=query_generation, autospec=True
+    )
+    from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
+    assert len(sessions) > 1
+    session_ids = [session_id for ids in sessions.values() for session_id in ids]
+    assert len(session_ids) == len(set(session_ids)) == len(sessions)
+
+
+def test__query_generation_resumes_from_staged_chunks(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.from_entsoe.QUERY_BASE_DELAY", 0.0)
+    mocker.patch("elmada.from_entsoe._get_client", return_value=EntsoePandasClient)
+    response = requests.Response()
+    response.status_code = 503
+    calls = []
+    missing_months = [5]
+
+    def query_generation(start, end, country_code):
+        calls.append(start.month)
+        if calls.count(start.month) == 1 and start.month in (3, 4):
+            raise requests.HTTPError(response=response)  # transient
+        if start.month in missing_months:
+            raise NoMatchingDataError
+        return pd.DataFrame({"Nuclear": [float(start.month)]}, index=[start])
+
+    mocker.patch("entsoe.EntsoePandasClient.query_generation", side_effect=query_generation)
+    with pytest.raises(exceptions.NoDataError):
+        from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
+    assert sorted(calls) == [1, 2, 3, 3, 4, 4] + list(range(5, 13))
+    assert len(list(from_entsoe._get_staging_dir(2019, "DE").iterdir())) == 11
+
+    calls.clear()
+    missing_months.clear()
+    df = from_entsoe._query_generation(year=2019, country="DE", split_queries=True)
+    assert calls == [5]
+    assert df["Nuclear"].tolist() == list(range(1, 13))
+    assert not from_entsoe._get_staging_dir(2019, "DE").exists()
+
+
+def test_concurrent_identical_queries_are_coalesced(mocker):
+    def query_day_ahead_prices(start, end, country_code):
+        time.sleep(0.2)
+        idx = pd.date_range(start, end, freq="60min", inclusive="left")
+        return pd.Series(1.0, index=idx)
+
+    mocker.patch("elmada.from_entsoe._get_client", return_value=EntsoePandasClient)
+    mock = mocker.patch(
+        "entsoe.EntsoePandasClient.query_day_ahead_prices", side_effect=query_day_ahead_prices
+    )
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(
+            executor.map(
+                lambda _: from_entsoe.prep_dayahead_prices(2019, country="DE", cache=False),
+                range(4),
+            )
+        )
+    mock.assert_called_once()
+    assert all(len(result) == 8760 for result in results)
+
+
+def test_load_el_national_generation_with_update(mocker, tmp_path):
+    full = hp.read(paths.mode_dependent_cache_fp(2019, "DE", kind="gen"))
+    cut = pd.Timestamp("2019-07-01", tz="Europe/Berlin")
+    fp = tmp_path / "2019_DE_gen_entsoe.parquet"
+    hp.write(full[full.index < cut], fp)
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.paths.mode_dependent_cache_dir", return_value=tmp_path)
+    mocker.patch("elmada.from_entsoe._get_client", return_value=EntsoePandasClient)
+    mock = mocker.patch(
+        "entsoe.EntsoePandasClient.query_generation", return_value=full[full.index >= cut]
+    )
+
+    assert from_entsoe.get_number_of_valid_steps(2019, "DE", "60min") < 8760
+    from_entsoe.load_el_national_generation(year=2019, country="DE", freq=None, update=True)
+    assert mock.call_args.kwargs["start"] == cut
+    assert hp.read(fp).equals(full)
+    assert from_entsoe.get_number_of_valid_steps(2019, "DE", "60min") == 8760
+
+    from_entsoe.load_el_national_generation(year=2019, country="DE", freq=None, update=True)
+    mock.assert_called_once()
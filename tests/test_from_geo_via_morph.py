@@ -1,12 +1,13 @@
-from elmada import from_geo_via_morph, paths
+from elmada import from_geo_via_morph, replay, web
 
 
-def test_download_database(mocker):
-    mock = mocker.patch("elmada.helper.get_api_key", return_value="123")
-    mock = mocker.patch("requests.get")
-    type(mock.return_value).content = mocker.PropertyMock(return_value="xx".encode())
-    fp = paths.CACHE_DIR / "test_file.csv"
-    from_geo_via_morph.download_database(fp=fp)
-    assert fp.exists()
-    fp.unlink()
-    mock.assert_called_once()
+def test_download_database(mocker, tmp_path):
+    mocker.patch("elmada.helper.get_api_key", return_value="123")
+    url = web.BASE_URLS["morph"] + "coroa/global_energy_observatory_power_plants/data.sqlite"
+    replay.Cassette(tmp_path).put("GET", url, 200, {"ETag": '"v1"'}, b"xx")
+    fp = tmp_path / "test_file.db"
+    with replay.StandInServer(tmp_path) as server:
+        assert from_geo_via_morph.download_database(fp=fp)
+        assert not from_geo_via_morph.download_database(fp=fp)
+    assert fp.read_bytes() == b"xx"
+    assert server.counts == {"replayed": 2}
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import pytest
 from pytest_mock import MockerFixture
@@ -5,7 +6,7 @@ from pytest_mock import MockerFixture
 import elmada
 from elmada import from_opsd
 from elmada import helper as hp
-from elmada import paths
+from elmada import paths, replay, web
 from elmada.mode import ConfigUtil
 
 
@@ -56,11 +57,90 @@ def test_get_summary_of_opsd_raw():
     assert isinstance(result, pd.DataFrame)
 
 
-def test_download_powerplant_list(mocker):
-    mock = mocker.patch("requests.get")
-    type(mock.return_value).content = mocker.PropertyMock(return_value="xx".encode())
-    fp = paths.CACHE_DIR / "test_file.csv"
-    from_opsd.download_powerplant_list(which="DE", fp=fp)
-    assert fp.exists()
-    fp.unlink()
-    mock.assert_called_once()
+def test_download_powerplant_list(tmp_path):
+    url = (
+        web.BASE_URLS["opsd"] + "conventional_power_plants/latest/conventional_power_plants_DE.csv"
+    )
+    replay.Cassette(tmp_path).put("GET", url, 200, {"ETag": '"v1"'}, b"xx")
+    fp = tmp_path / "test_file.csv"
+    with replay.StandInServer(tmp_path) as server:
+        assert from_opsd.download_powerplant_list(which="DE", fp=fp)
+        assert not from_opsd.download_powerplant_list(which="DE", fp=fp)
+    assert fp.read_bytes() == b"xx"
+    assert server.counts == {"replayed": 2}
+
+
+def test_get_marginal_plant_indices():
+    cumsum_capa = np.array([10.0, 20.0, 20.0, 35.0])
+    resi_values = np.array([-5.0, 0.0, 10.0, 19.9, 20.0, 34.0, 50.0, np.nan])
+    result = from_opsd.get_marginal_plant_indices(cumsum_capa, resi_values)
+    assert result.tolist() == [0, 0, 1, 1, 3, 3, 3, 3]
+
+
+def test_get_emissions_at_residual_load():
+    cumsum_capa = np.array([10.0, 20.0, 20.0, 35.0])
+    capa = np.array([10.0, 10.0, 0.0, 15.0])
+    marginal_emissions = np.array([0.0, 0.4, 0.8, 0.3])
+    resi_values = np.array([-5.0, 0.0, 5.0, 15.0, 20.0, 30.0, 50.0])
+    result = from_opsd.get_emissions_at_residual_load(
+        cumsum_capa=cumsum_capa,
+        capa=capa,
+        marginal_emissions=marginal_emissions,
+        resi_values=resi_values,
+    )
+    assert result == pytest.approx([0.0, 0.0, 0.0, 2.0, 4.0, 7.0, 8.5])
+
+
+def test_get_marginal_plant_indices_and_emissions_of_several_merit_orders():
+    rng = np.random.default_rng(0)
+    capa = rng.uniform(0.0, 10.0, size=(5, 20))
+    cumsum_capa = capa.cumsum(axis=1)
+    marginal_emissions = rng.uniform(0.0, 1.0, size=(5, 20))
+    resi_values = np.concatenate(
+        [
+            rng.uniform(-20.0, 250.0, size=100),
+            [np.nan, np.inf, -np.inf],
+            cumsum_capa.ravel(),
+            # just below the plant boundaries:
+            (cumsum_capa - 1e-9).ravel(),
+        ]
+    )
+
+    indices = from_opsd.get_marginal_plant_indices(cumsum_capa, resi_values)
+    emissions = from_opsd.get_emissions_at_residual_load(
+        cumsum_capa=cumsum_capa,
+        capa=capa,
+        marginal_emissions=marginal_emissions,
+        resi_values=resi_values,
+        marginal_idx=indices,
+    )
+    for s in range(5):
+        assert indices[s].tolist() == (
+            from_opsd.get_marginal_plant_indices(cumsum_capa[s], resi_values).tolist()
+        )
+        expected = from_opsd.get_emissions_at_residual_load(
+            cumsum_capa=cumsum_capa[s],
+            capa=capa[s],
+            marginal_emissions=marginal_emissions[s],
+            resi_values=resi_values,
+        )
+        assert emissions[s] == pytest.approx(expected, nan_ok=True)
+
+
+def test_get_CEFs_from_merit_orders():
+    config = dict(year=2019, freq="60min", country="DE")
+    mo_Ps = [from_opsd.merit_order(year=2019), from_opsd.merit_order(2019, overwrite_carbon_tax=80)]
+    # a shorter merit order, which is padded for the dispatch:
+    mo_Ps.append(mo_Ps[0].iloc[:100])
+    result = from_opsd.get_CEFs_from_merit_orders(mo_Ps=mo_Ps, **config)
+    assert result.columns.names == ["scenario", None]
+    assert result.xs("MEFs", axis=1, level=1).shape == (8760, 3)
+    for scenario in (1, 2):
+        expected = from_opsd.get_CEFs_from_merit_order(mo_P=mo_Ps[scenario], **config)
+        assert result[scenario].equals(expected)
+
+
+def test_prep_CEFs_for_scenarios(mocker):
+    mock = mocker.patch("elmada.from_opsd.get_CEFs_from_merit_orders")
+    from_opsd.prep_CEFs_for_scenarios(scenarios={"a": {}, "b": dict(overwrite_carbon_tax=80)})
+    assert list(mock.call_args.kwargs["mo_Ps"]) == ["a", "b"]
@@ -34,3 +34,34 @@ def test_get_ice_eua_prices_without_cache():
 def test_get_sandbag_eua_prices():
     result = from_other.get_sandbag_eua_prices()
     assert isinstance(result, Dict)
+
+
+def test_get_destatis_fuel_prices(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    expected = from_other.get_destatis_fuel_prices(cache=False)
+    assert expected.index.names == ["fuel", "country", "year"]
+    assert set(expected.index.unique("fuel")) == {"coal_index", "lignite_index", "gas"}
+
+    assert from_other.get_destatis_fuel_prices().equals(expected)
+    mock = mocker.patch("elmada.from_other.prepare_destatis_fuel_prices")
+    assert from_other.get_destatis_fuel_prices().equals(expected)
+    mock.assert_not_called()
+
+
+def test_get_fuel_prices():
+    result = from_other.get_fuel_prices(year=2019, country="DE")
+    assert result["gas"] == pytest.approx(26.8)
+    assert result["coal"] == pytest.approx(12.65)
+    assert result["lignite"] == pytest.approx(6.5142)
+
+
+def test_get_ETS_price_series():
+    result = from_other.get_ETS_price_series([2019, 2100])
+    assert result[2019] == from_other.get_ETS_price(2019)
+    assert result[2100] == from_other.get_ETS_price(2100)
+
+
+def test_get_transmission_efficiencies():
+    result = from_other.get_transmission_efficiencies(["DE", "THIS_IS_NOT_A_VALID_COUNTRY"])
+    assert result["DE"] == from_other.get_transmission_efficiency("DE")
+    assert result.iloc[1] == from_other.get_transmission_efficiency("THIS_IS_NOT_A_VALID_COUNTRY")
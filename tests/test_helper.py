@@ -1,5 +1,10 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -84,6 +89,31 @@ def test_delete_cache(mocker, capsys):
     assert not fp.exists()
 
 
+def test_delete_cache_skips_staging_and_locks(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.helper.confirm_deletion", return_value=True)
+    fp = tmp_path / "2019_DE_gen_entsoe.parquet"
+    fp.touch()
+    validators_fp = tmp_path / f".{fp.name}.http.json"
+    validators_fp.touch()
+    staging_fp = tmp_path / ".staging" / "2019_DE_gen_entsoe" / "chunk_0.parquet"
+    staging_fp.parent.mkdir(parents=True)
+    staging_fp.touch()
+    held_lock_fp = tmp_path / ".2019_DE_held.lock"
+    held_lock_fp.touch()
+    stale_lock_fp = tmp_path / ".2019_DE_stale.lock"
+    stale_lock_fp.touch()
+    old = time.time() - 2 * hp.DEFAULT_STALE_LOCK_AGE
+    os.utime(stale_lock_fp, (old, old))
+
+    hp.delete_cache()
+    assert not fp.exists()
+    assert not (tmp_path / ".staging").exists()
+    assert held_lock_fp.exists()
+    assert not stale_lock_fp.exists()
+    assert validators_fp.exists()
+
+
 def test_print_error(capsys):
     a = pd.Series(10, range(10))
     b = a * 1.1
@@ -120,6 +150,14 @@ def test_sizeof_fmt():
     assert hp.sizeof_fmt(2e24) == "2.0 YB"
 
 
+def test_make_cache_key():
+    key = hp.make_cache_key(dict(a=1, b=2), "safe")
+    assert key == hp.make_cache_key(dict(b=2, a=1), "safe")
+    assert key != hp.make_cache_key(dict(a=1, b=3), "safe")
+    assert key != hp.make_cache_key(dict(a=1, b=2), "live")
+    assert len(key) == 16
+
+
 def test_write():
     ser = pd.Series(range(4))
     path_scheme = paths.CACHE_DIR / "test_file_XXX.suffix"
@@ -151,6 +189,273 @@ def test_read(mocker):
         hp.read(Path("spam.egg"))
 
 
+def test_read_in_memory(tmp_path):
+    hp.clear_memory_cache()
+    fp = tmp_path / "test_file.parquet"
+    hp.write(pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}), fp)
+
+    df = hp.read(fp, in_memory=True)
+    assert df.equals(hp.read(fp))
+    with pytest.raises(ValueError):
+        df.loc[0, "a"] = 5.0
+    df["a"] = 0.0
+    assert hp.read(fp, in_memory=True)["a"].tolist() == [1.0, 2.0]
+
+    hp.write(pd.DataFrame({"a": [7.0, 8.0], "b": [9.0, 10.0]}), fp)
+    assert hp.read(fp, in_memory=True)["a"].tolist() == [7.0, 8.0]
+    assert len(hp.MEMORY_CACHE.entries) == 1
+
+    hp.set_memory_cache_size(0)
+    assert len(hp.MEMORY_CACHE.entries) == 0
+    hp.set_memory_cache_size(hp.DEFAULT_MEMORY_CACHE_SIZE)
+
+
+def test_read_columns(tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}, index=pd.Index([5, 6], name="t"))
+    hp.write(df, fp)
+
+    assert hp.read_column_names(fp) == ["a", "b"]
+    assert hp.read(fp, squeeze=False, columns=["b"]).equals(df[["b"]])
+    assert hp.read(fp, squeeze=False, in_memory=True, columns=["b"]).equals(df[["b"]])
+
+
+def test_write_fixed_point(tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    df = pd.DataFrame({"a": [1.234, np.nan, -3.0], "b": [1.0, 2.0, 3.0]})
+    hp.write(df, fp, fixed_point={"a": 2})
+
+    assert hp.read_column_names(fp) == ["a", "b"]
+    result = hp.read(fp, squeeze=False)
+    assert result["a"].equals(df["a"].round(2))
+    assert result["b"].equals(df["b"])
+    assert hp.read(fp, squeeze=False, columns=["a"])["a"].equals(df["a"].round(2))
+
+
+def test_reference_data(tmp_path):
+    fp = tmp_path / "test_file.csv"
+    fp.write_text("a")
+    calls = []
+
+    @hp.reference_data(files=lambda factor: [fp])
+    def load(factor):
+        calls.append(factor)
+        return pd.Series([1.0, 2.0]) * factor
+
+    assert load(2).tolist() == [2.0, 4.0]
+    assert load(2).tolist() == [2.0, 4.0]
+    assert calls == [2]
+    with pytest.raises(ValueError):
+        load(2)[0] = 5.0
+
+    load(3)
+    assert calls == [2, 3]
+
+    fp.write_text("ab")
+    load(2)
+    assert calls == [2, 3, 2]
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather", ".csv"])
+def test_storage_backends(tmp_path, suffix):
+    fp = tmp_path / f"test_file{suffix}"
+    df = pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]})
+    hp.write(df, fp)
+    assert hp.read(fp).equals(df)
+    assert hp.read_column_names(fp) == ["a", "b"]
+
+    ser = pd.Series([1.0, 2.0])
+    hp.write(ser, fp)
+    assert hp.read(fp).name is None
+    assert hp.read(fp).equals(ser)
+
+
+def test_storage_backend_options(tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    df = pd.DataFrame({"a": np.arange(100.0)}, index=pd.Index(range(100), name="t"))
+    hp.write(df, fp, backend=hp.ParquetBackend(compression="zstd", row_group_size=10))
+    assert hp.read(fp, squeeze=False).equals(df)
+
+    fp = tmp_path / "test_file.feather"
+    hp.write(df.assign(b=df["a"]), fp, fixed_point={"b": 1})
+    assert hp.read(fp, squeeze=False, columns=["b"])["b"].equals(df["a"])
+    result = hp.read(fp, squeeze=False, columns=["a"])
+    assert result.equals(df)
+    with pytest.raises(ValueError):
+        result.iloc[0, 0] = 5.0
+
+
+def test_incomplete_storage_backend():
+    class WriteOnlyBackend(hp.StorageBackend):
+        suffix = ".wo"
+
+        def write(self, data, fp):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnlyBackend()
+
+
+def test_npy_backend(tmp_path):
+    fp = tmp_path / "test_file.npy"
+    ser = pd.Series([1.0, 2.0, 3.0])
+    hp.write(ser, fp)
+    assert hp.read(fp).equals(ser)
+    assert hp.read(fp, squeeze=False).columns.tolist() == [hp.DEFAULT_HEADER]
+
+    with pytest.raises(ValueError):
+        hp.write(pd.Series([1.0], index=[5]), fp)
+    with pytest.raises(ValueError):
+        hp.write(pd.DataFrame({"a": [1.0], "b": [2.0]}), fp)
+    with pytest.raises(ValueError):
+        hp.write(ser, tmp_path / "test_file.h5")
+
+
+def test_write_is_atomic(mocker, tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    hp.write(pd.Series([1.0, 2.0]), fp)
+
+    mocker.patch.object(hp.ParquetBackend, "write", side_effect=OSError("disk full"))
+    with pytest.raises(OSError):
+        hp.write(pd.Series([3.0, 4.0]), fp)
+    assert hp.read(fp).tolist() == [1.0, 2.0]
+    assert [x.name for x in tmp_path.iterdir()] == ["test_file.parquet"]
+
+
+def test_file_lock(tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    lock_fp = tmp_path / ".test_file.parquet.lock"
+    active = []
+
+    def work(i):
+        with hp.file_lock(fp, poll_interval=0.01):
+            active.append(i)
+            assert len(active) == 1
+            time.sleep(0.02)
+            active.remove(i)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not lock_fp.exists()
+
+    with hp.file_lock(fp):
+        with pytest.raises(TimeoutError):
+            with hp.file_lock(fp, timeout=0.05, poll_interval=0.01):
+                pass
+
+    lock_fp.write_text("crashed worker")
+    os.utime(lock_fp, (0, 0))
+    with hp.file_lock(fp, timeout=1):
+        assert lock_fp.exists()
+
+
+def test_file_lock_with_concurrent_waiters_on_stale_lock(mocker, tmp_path):
+    fp = tmp_path / "test_file.parquet"
+    lock_fp = tmp_path / ".test_file.parquet.lock"
+    lock_fp.write_text("crashed worker")
+    os.utime(lock_fp, (0, 0))
+
+    # both waiters see the stale lock before one of them takes it over:
+    barrier = threading.Barrier(2)
+    is_stale = hp._is_stale
+    seen = threading.local()
+
+    def is_stale_after_barrier(fp, stale_after):
+        if fp == lock_fp and not getattr(seen, "stale", False):
+            seen.stale = True
+            result = is_stale(fp, stale_after)
+            barrier.wait()
+            return result
+        return is_stale(fp, stale_after)
+
+    mocker.patch("elmada.helper._is_stale", side_effect=is_stale_after_barrier)
+    active, max_active = [], []
+
+    def work(i):
+        with hp.file_lock(fp, poll_interval=0.01):
+            active.append(i)
+            max_active.append(len(active))
+            time.sleep(0.1)
+            active.remove(i)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(max_active) == 1
+    assert not lock_fp.exists()
+
+
+def test_retry():
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError
+        return "ok"
+
+    is_transient = lambda e: isinstance(e, ConnectionError)
+    assert hp.retry(func, is_transient=is_transient, base_delay=0.0) == "ok"
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(ConnectionError):
+        hp.retry(func, is_transient=is_transient, max_attempts=2, base_delay=0.0)
+    assert len(calls) == 2
+
+    calls.clear()
+    with pytest.raises(ConnectionError):
+        hp.retry(func, is_transient=lambda e: False)
+    assert len(calls) == 1
+
+
+def test_single_flight():
+    calls = []
+
+    @hp.single_flight
+    def query(year, country="DE"):
+        calls.append((year, country))
+        time.sleep(0.2)
+        if country == "XX":
+            raise ValueError("no data")
+        return pd.Series([float(year)])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(query, 2019), executor.submit(query, year=2019)]
+        futures += [executor.submit(query, 2019, "DE"), executor.submit(query, 2020)]
+        results = [future.result() for future in futures]
+    assert sorted(calls) == [(2019, "DE"), (2020, "DE")]
+    assert all(result.tolist() == [2019.0] for result in results[:3])
+    assert len({id(result) for result in results}) == 4
+
+    calls.clear()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(query, 2019, "XX") for _ in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError, match="no data"):
+            future.result()
+    assert calls == [(2019, "XX")]
+
+    query(2019)
+    assert calls == [(2019, "XX"), (2019, "DE")]
+    assert not hp.SINGLE_FLIGHT.calls
+
+
+def test_rate_limiter():
+    limiter = hp.RateLimiter(max_calls=3, period=0.2)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.1
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.2
+
+
 def test_make_symlink_to_cache(mocker):
     mock = mocker.patch.object(Path, "symlink_to")
     hp.make_symlink_to_cache()
@@ -1,7 +1,12 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import pytest
 
 import elmada
+from elmada import helper as hp
+from elmada.exceptions import NoDataError
 
 
 def test_get_emissions(mocker):
@@ -21,6 +26,185 @@ def test_get_emissions(mocker):
         mock.assert_called_once_with(**kwargs)
 
 
+def test_get_emissions_cache_covers_mo_kwargs_and_input_files(mocker, tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    input_fp = raw_dir / "input.csv"
+    input_fp.write_text("a")
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.paths.DATA_DIR", raw_dir)
+    mock = mocker.patch(
+        "elmada.main._make_emissions", return_value=pd.DataFrame({"XEFs": [1.0, 2.0]})
+    )
+    config = dict(year=2019, freq="60min", country="DE", method="XEF_PWL")
+
+    elmada.get_emissions(**config, overwrite_carbon_tax=50)
+    elmada.get_emissions(**config, overwrite_carbon_tax=50)
+    assert mock.call_count == 1
+
+    elmada.get_emissions(**config, overwrite_carbon_tax=60)
+    assert mock.call_count == 2
+
+    input_fp.write_text("ab")
+    elmada.get_emissions(**config, overwrite_carbon_tax=50)
+    assert mock.call_count == 3
+    # the result of the outdated input file is replaced:
+    assert len(list(tmp_path.glob("2019_DE_60min_CEFs_PWL_*"))) == 2
+
+
+def test_get_emissions_without_cache_does_not_fingerprint_inputs(mocker):
+    mocker.patch("elmada.main._make_emissions", return_value=pd.DataFrame({"XEFs": [1.0, 2.0]}))
+    mock = mocker.patch("elmada.paths.input_files")
+    elmada.get_emissions(year=2019, method="XEF_PWL", cache=False)
+    mock.assert_not_called()
+
+
+def test_get_emissions_with_compact_dtype_policy(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.mode.ConfigUtil.dtype_policy", "compact")
+    config = dict(year=2019, freq="60min", country="DE", method="_PWL")
+
+    result = elmada.get_emissions(**config)
+    assert result["marginal_fuel"].dtype == "category"
+    assert result["MEFs"].equals(result["MEFs"].round(hp.CEF_DECIMALS))
+    assert elmada.get_emissions(**config).equals(result)
+    gen = elmada.from_entsoe.load_el_national_generation(year=2019, freq="60min", country="DE")
+    assert (gen.dtypes == "float32").all()
+
+
+def test_get_emissions_computes_once_for_concurrent_workers(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+
+    def make_emissions(**kwargs):
+        time.sleep(0.3)
+        return pd.DataFrame({"XEFs": [1.0, 2.0]})
+
+    mock = mocker.patch("elmada.main._make_emissions", side_effect=make_emissions)
+    config = dict(year=2019, freq="60min", country="DE", method="XEF_PWL")
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: elmada.get_emissions(**config), range(3)))
+
+    assert mock.call_count == 1
+    assert all(result.equals(results[0]) for result in results)
+
+
+def test_update_emissions_computes_only_new_timesteps(mocker):
+    resi_T = pd.Series([1.0, 2.0, 3.0, 4.0, 5.0])
+    mocker.patch("elmada.from_entsoe.prep_residual_load", return_value=resi_T)
+    mock = mocker.patch(
+        "elmada.main._make_emissions", side_effect=lambda resi_T, **kw: resi_T.to_frame("XEFs")
+    )
+    df_old = pd.DataFrame({"XEFs": [1.0, 2.0]})
+    result = elmada.main._update_emissions(
+        df_old, year=2019, freq="60min", country="DE", method="PWL"
+    )
+    assert list(mock.call_args.kwargs["resi_T"].index) == [2, 3, 4]
+    assert result["XEFs"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_get_emissions_update_recomputes_if_other_inputs_changed(mocker, tmp_path):
+    year = pd.Timestamp.now().year
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_fp = raw_dir / "fuel_prices.csv"
+    raw_fp.write_text("a")
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    mocker.patch("elmada.paths.DATA_DIR", raw_dir)
+    gen_fp = elmada.from_entsoe._get_generation_fp(year, "DE")
+    gen_fp.write_text("1")
+
+    def update_generation(**kwargs):
+        gen_fp.write_text(gen_fp.read_text() + "1")
+
+    mocker.patch("elmada.from_entsoe.load_el_national_generation", side_effect=update_generation)
+    mocker.patch(
+        "elmada.from_entsoe.get_number_of_valid_steps",
+        side_effect=lambda **kw: len(gen_fp.read_text()),
+    )
+    make = mocker.patch(
+        "elmada.main._make_emissions", side_effect=lambda **kw: pd.DataFrame({"XEFs": [1.0] * 9})
+    )
+    update = mocker.patch(
+        "elmada.main._update_emissions",
+        side_effect=lambda df_old, **kw: pd.concat([df_old, pd.DataFrame({"XEFs": [2.0]})]),
+    )
+    config = dict(year=year, country="DE", method="XEF_PWL", update=True)
+
+    assert len(elmada.get_emissions(**config)) == 2
+    assert (make.call_count, update.call_count) == (1, 0)
+
+    # only the generation data changed:
+    assert len(elmada.get_emissions(**config)) == 3
+    assert (make.call_count, update.call_count) == (1, 1)
+
+    # the fuel prices changed, too:
+    raw_fp.write_text("b")
+    assert len(elmada.get_emissions(**config)) == 4
+    assert (make.call_count, update.call_count) == (2, 1)
+    assert len(list(tmp_path.glob(f"{year}_DE_60min_CEFs_PWL_*"))) == 1
+
+
+def test_get_emissions_returns_only_steps_with_data(mocker):
+    year = pd.Timestamp.now().year
+    mocker.patch(
+        "elmada.main._make_emissions", return_value=pd.DataFrame({"XEFs": [1.0, 2.0, 3.0]})
+    )
+    mocker.patch("elmada.from_entsoe.get_number_of_valid_steps", return_value=2)
+    mocker.patch("elmada.from_entsoe.load_el_national_generation")
+
+    # without update, all timesteps are returned:
+    result = elmada.get_emissions(year=year, method="XEF_PWL", cache=False)
+    assert result.tolist() == [1.0, 2.0, 3.0]
+
+    config = dict(year=year, method="XEF_PWL", cache=False, update=True)
+    result = elmada.get_emissions(**config, use_datetime=True)
+    assert result.tolist() == [1.0, 2.0]
+    assert result.index[0] == pd.Timestamp(f"{year}-01-01")
+
+    result = elmada.get_emissions(**config, fill_to_whole_year=True)
+    assert len(result) == len(hp.make_datetimeindex(year=year, freq="60min"))
+    assert result.iloc[-1] == 2.0
+
+
+def test_pad_to_whole_year():
+    df = pd.DataFrame({"XEFs": [1.0, 2.0]})
+    result = elmada.main._pad_to_whole_year(df, year=2019, freq="60min")
+    assert len(result) == 8760
+    assert result["XEFs"].iloc[-1] == 2.0
+
+
+def test_get_emissions_batch(mocker):
+    def fake_get_emissions(year, country, method, freq):
+        if country == "XX":
+            raise NoDataError("no Data")
+        return pd.Series([year, 1.0], name="XEFs")
+
+    mocker.patch("elmada.main.get_emissions", side_effect=fake_get_emissions)
+    panel = elmada.get_emissions_batch(
+        years=[2019, 2020], countries=["DE", "XX"], methods=["XEF_PWL"], max_workers=1
+    )
+    assert panel.index.names == ["year", "country", "method", "t"]
+    assert panel.loc[(2020, "DE", "XEF_PWL", 0), "value"] == 2020
+    assert len(panel) == 4
+    assert panel.attrs["failures"] == {
+        (2019, "XX", "XEF_PWL"): "NoDataError: no Data",
+        (2020, "XX", "XEF_PWL"): "NoDataError: no Data",
+    }
+
+
+def test_get_emissions_item_restores_config(mocker):
+    mocker.patch("elmada.mode.ConfigUtil.cef_cache_suffix", ".parquet")
+    item = dict(year=2019, country="DE", method="XEF_PWL", config=elmada.mode.get_config())
+
+    # a spawned worker process starts with the default settings:
+    mocker.patch("elmada.mode.ConfigUtil.cef_cache_suffix", ".feather")
+    mock = mocker.patch(
+        "elmada.main.get_emissions", side_effect=lambda **kw: hp.get_cef_cache_suffix()
+    )
+    assert elmada.main._get_emissions_item(item) == (".parquet", None)
+    mock.assert_called_once_with(year=2019, country="DE", method="XEF_PWL")
+
+
 pp_keys = pd.Index(
     [
         "id",
@@ -125,3 +309,19 @@ def test_get_prices(mocker):
     pwl_mock = mocker.patch("elmada.main.get_emissions", return_value={"marginal_cost": True})
     elmada.get_prices(**config, method="PWL")
     pwl_mock.assert_called_once_with(**config, method="_PWL")
+
+
+def test_get_emissions_sweep():
+    config = dict(year=2019, freq="60min", country="DE")
+    result = elmada.get_emissions_sweep(**config, method="MEF_PWL", carbon_prices=[20, 80])
+    assert list(result.columns) == [20, 80]
+    expected = elmada.get_emissions(
+        **config, method="MEF_PWL", cache=False, overwrite_carbon_tax=80
+    )
+    assert result[80].equals(expected)
+
+    result = elmada.get_emissions_sweep(**config, method="_PP", carbon_prices=[20])
+    assert result.columns.names == ["carbon_price", None]
+
+    with pytest.raises(ValueError):
+        elmada.get_emissions_sweep(**config, method="XEF_EP", carbon_prices=[20])
@@ -0,0 +1,99 @@
+import time
+
+import pandas as pd
+import pytest
+
+from elmada import helper as hp
+from elmada import manifest, paths
+
+
+@pytest.fixture
+def cache_dir(mocker, tmp_path):
+    mocker.patch("elmada.paths.CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def write_files(cache_dir, n: int):
+    for i in range(n):
+        hp.write(pd.DataFrame({"a": range(100)}), cache_dir / f"file_{i}.parquet", params=dict(i=i))
+
+
+def test_record_write(cache_dir):
+    write_files(cache_dir, 2)
+    hp.write(pd.Series([1.0, 2.0]), cache_dir / "other.parquet")
+
+    df = manifest.query()
+    assert df["name"].tolist() == ["file_0.parquet", "file_1.parquet", "other.parquet"]
+    assert df["params"].tolist() == [dict(i=0), dict(i=1), None]
+    assert df["source"].tolist() == ["tests.test_manifest.write_files"] * 2 + [
+        "tests.test_manifest.test_record_write"
+    ]
+    assert manifest.get_size() == sum(fp.stat().st_size for fp in cache_dir.glob("*.parquet"))
+    assert manifest.query(pattern="file%")["name"].tolist() == ["file_0.parquet", "file_1.parquet"]
+
+
+def test_record_access(cache_dir, mocker):
+    mocker.patch("elmada.manifest.ACCESS_UPDATE_INTERVAL", 0)
+    write_files(cache_dir, 2)
+    hp.read(cache_dir / "file_0.parquet")
+    assert manifest.query()["name"].tolist() == ["file_1.parquet", "file_0.parquet"]
+
+
+def test_record_access_is_throttled(cache_dir, mocker):
+    write_files(cache_dir, 2)
+    hp.read(cache_dir / "file_0.parquet")
+    df = manifest.query()
+    assert df["name"].tolist() == ["file_0.parquet", "file_1.parquet"]
+    assert df["last_access"].equals(df["created"])
+
+    connect = mocker.spy(manifest, "_connect")
+    hp.read(cache_dir / "file_0.parquet")
+    assert connect.call_count == 0
+
+
+def test_quota(cache_dir, mocker):
+    mocker.patch("elmada.manifest.ACCESS_UPDATE_INTERVAL", 0)
+    write_files(cache_dir, 4)
+    hp.read(cache_dir / "file_0.parquet")
+    size = (cache_dir / "file_0.parquet").stat().st_size
+
+    manifest.set_quota(3 * size)
+    assert manifest.get_quota() == 3 * size
+    assert not (cache_dir / "file_1.parquet").exists()
+    assert manifest.query()["name"].tolist() == [
+        "file_2.parquet",
+        "file_3.parquet",
+        "file_0.parquet",
+    ]
+
+    hp.write(pd.DataFrame({"a": range(100)}), cache_dir / "file_4.parquet")
+    assert not (cache_dir / "file_2.parquet").exists()
+    assert (cache_dir / "file_4.parquet").exists()
+
+    manifest.set_quota(None)
+    assert manifest.get_quota() is None
+
+
+def test_purge(cache_dir):
+    write_files(cache_dir, 3)
+    assert manifest.purge(pattern="file_1%") == 1
+    assert not (cache_dir / "file_1.parquet").exists()
+
+    assert manifest.purge(accessed_before=time.time()) == 2
+    assert manifest.query().empty
+    assert manifest.get_db_fp().exists()
+
+
+def test_sync(cache_dir):
+    write_files(cache_dir, 2)
+    (cache_dir / "file_0.parquet").unlink()
+    (cache_dir / "untracked.csv").write_text("a")
+
+    manifest.sync()
+    assert set(manifest.query()["name"]) == {"untracked.csv", "file_1.parquet"}
+
+
+def test_input_files_exclude_manifest(cache_dir):
+    write_files(cache_dir, 1)
+    assert manifest.get_db_fp().exists()
+    assert manifest.get_db_fp() not in paths.input_files(year=2019, country="DE")
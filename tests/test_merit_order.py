@@ -0,0 +1,44 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from elmada import from_opsd
+from elmada.merit_order import MeritOrder
+
+
+def get_mo_frame():
+    return pd.DataFrame(
+        dict(
+            fuel_draf=["nuclear", "lignite", "gas", np.nan],
+            capa=[10.0, 20.0, 5.0, 1.0],
+            used_eff=[0.33, 0.4, 0.5, 0.3],
+            marginal_cost=[10.0, 30.0, 60.0, 90.0],
+            marginal_emissions=[0.0, 1.0, 0.4, 0.9],
+        )
+    ).assign(cumsum_capa=lambda df: df["capa"].cumsum())
+
+
+def test_MeritOrder_roundtrip():
+    df = get_mo_frame()
+    mo = MeritOrder.from_frame(df)
+    assert len(mo) == 4
+    assert mo.fuel_codes.dtype == np.int8
+    assert mo.capa.flags["C_CONTIGUOUS"]
+    pd.testing.assert_frame_equal(mo.to_frame(), df[mo.to_frame().columns])
+
+    mo2 = pickle.loads(pickle.dumps(mo))
+    pd.testing.assert_frame_equal(mo2.to_frame(), mo.to_frame())
+
+
+def test_MeritOrder_is_accepted_by_get_CEFs_from_merit_order(mocker):
+    df = get_mo_frame()
+    resi_T = pd.Series([5.0, 25.0, 33.0])
+    total_load_T = pd.Series([10.0, 30.0, 40.0])
+    mocker.patch("elmada.from_opsd.get_dispatch_inputs", return_value=(resi_T, total_load_T, 1.0))
+    kw = dict(year=2019, freq="60min", country="DE")
+    result = from_opsd.get_CEFs_from_merit_order(mo_P=MeritOrder.from_frame(df), **kw)
+    pd.testing.assert_frame_equal(result, from_opsd.get_CEFs_from_merit_order(mo_P=df, **kw))
+    assert list(result["marginal_fuel"]) == ["nuclear", "lignite", "gas"]
+    assert list(result["MEFs"]) == pytest.approx([0.0, 1000.0, 400.0])
@@ -22,3 +22,26 @@ def test_set_mode():
 def test_is_safe_mode(mocker):
     mocker.patch("elmada.mode.get_mode", return_value="safe")
     assert mode.is_safe_mode()
+
+
+def test_set_dtype_policy():
+    mode.set_dtype_policy("compact")
+    assert mode.is_compact_dtype_policy()
+
+    mode.set_dtype_policy("default")
+    assert mode.get_dtype_policy() == "default"
+
+    with pytest.raises(AssertionError):
+        mode.set_dtype_policy("other")
+
+
+def test_get_and_set_config():
+    backup = mode.get_config()
+    assert backup["mode"] == mode.get_mode()
+
+    mode.set_config(dict(backup, dtype_policy="compact", stand_in_url="http://127.0.0.1:1"))
+    assert mode.is_compact_dtype_policy()
+    assert mode.ConfigUtil.stand_in_url == "http://127.0.0.1:1"
+
+    mode.set_config(backup)
+    assert mode.get_config() == backup
@@ -0,0 +1,12 @@
+from elmada import paths
+
+
+def test_mode_dependent_cache_fp(mocker):
+    mocker.patch("elmada.paths.is_safe_mode", return_value=True)
+    fp = paths.mode_dependent_cache_fp(2019, "DE", kind="gen")
+    assert fp == paths.SAFE_CACHE_DIR / "2019_DE_gen_entsoe.parquet"
+    assert fp.exists()
+
+    mocker.patch("elmada.paths.is_safe_mode", return_value=False)
+    fp = paths.mode_dependent_cache_fp(2019, "DE", kind="gen")
+    assert fp == paths.CACHE_DIR / "2019_DE_gen_entsoe.parquet"
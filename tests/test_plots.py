@@ -1,5 +1,9 @@
 import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+
 import elmada
+from elmada.exceptions import NoDataError
 
 
 def test_merit_order():
@@ -22,5 +26,15 @@ def test_cef_country_map():
     elmada.plots.cef_country_map(year=2019, method="XEF_PWL", scope="Europe20")
 
 
+def test_cef_country_map_without_data(mocker):
+    panel = pd.DataFrame(
+        index=pd.MultiIndex.from_tuples([], names=["year", "country", "method", "t"])
+    )
+    panel.attrs["failures"] = {(2019, "DE", "XEF_PWL"): "NoDataError"}
+    mocker.patch("elmada.plots.get_emissions_batch", return_value=panel)
+    with pytest.raises(NoDataError, match="Failures"):
+        elmada.plots.cef_country_map(year=2019, method="XEF_PWL", scope="Europe20")
+
+
 def test_cefs_scatter_plotly():
     elmada.plots.cefs_scatter_plotly(year=2019, freq="60min", country="DE", method="MEF_PWL")
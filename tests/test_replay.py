@@ -0,0 +1,54 @@
+from elmada import from_opsd, replay, web
+
+
+def make_response(mocker, body: bytes):
+    response = mocker.Mock(status_code=200, content=body, headers={"ETag": '"v1"', "Server": "x"})
+    return mocker.patch("requests.request", return_value=response)
+
+
+def test_strip_secrets():
+    url = "https://web-api.tp.entsoe.eu/api?securityToken=SECRET&documentType=A75"
+    assert replay.strip_secrets(url) == "https://web-api.tp.entsoe.eu/api?documentType=A75"
+
+
+def test_record_and_replay(mocker, tmp_path):
+    url = web.BASE_URLS["opsd"] + "conventional_power_plants_DE.csv?api_key=SECRET"
+    mock = make_response(mocker, b"a,b\n1,2\n")
+
+    with replay.StandInServer(tmp_path, record=True) as server:
+        response = web.get(url)
+    assert response.content == b"a,b\n1,2\n"
+    assert mock.call_args.args == ("GET", url)
+    assert server.counts == {"recorded": 1}
+    assert all("SECRET" not in fp.read_text() for fp in tmp_path.glob("*.json"))
+    assert replay.Cassette(tmp_path).get("GET", url)[1] == {"ETag": '"v1"'}
+    assert web.get_stand_in_url() is None
+
+    mock.reset_mock()
+    with replay.StandInServer(tmp_path) as server:
+        response = web.get(url.replace("SECRET", "OTHER"))
+        assert response.headers["ETag"] == '"v1"'
+        assert web.get(web.BASE_URLS["opsd"] + "other.csv").status_code == 404
+    assert response.content == b"a,b\n1,2\n"
+    assert server.counts == {"replayed": 1, "missing": 1}
+    mock.assert_not_called()
+
+
+def test_session_and_error_injection(mocker, tmp_path):
+    make_response(mocker, b"<xml/>")
+    with replay.StandInServer(tmp_path, record=True):
+        assert web.make_session().get(web.BASE_URLS["entsoe"]).content == b"<xml/>"
+
+    with replay.StandInServer(tmp_path, error_rate=1.0, latency=0.01) as server:
+        response = web.make_session().get(web.BASE_URLS["entsoe"])
+    assert response.status_code == 503
+    assert server.counts == {"injected_errors": 1}
+
+
+def test_download_powerplant_list_from_stand_in(mocker, tmp_path):
+    make_response(mocker, b"a,b\n1,2\n")
+    with replay.StandInServer(tmp_path / "cassette", record=True):
+        from_opsd.download_powerplant_list(which="DE", fp=tmp_path / "recorded.csv")
+    with replay.StandInServer(tmp_path / "cassette"):
+        from_opsd.download_powerplant_list(which="DE", fp=tmp_path / "replayed.csv")
+    assert (tmp_path / "replayed.csv").read_bytes() == b"a,b\n1,2\n"
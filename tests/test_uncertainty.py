@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from elmada import eu_pwl, uncertainty
+
+
+@pytest.mark.wantcache
+def test_get_emissions_percentiles_without_uncertainty():
+    rel_std = dict(fuel_price=0.0, carbon_price=0.0, efficiency=0.0)
+    df = uncertainty.get_emissions_percentiles(
+        year=2019, country="DE", n_samples=3, rel_std=rel_std, max_workers=1
+    )
+    assert list(df.columns.get_level_values(0).unique()) == ["MEFs", "XEFs"]
+
+    expected = eu_pwl.prep_CEFs(year=2019, country="DE")
+    for cef_type in ["MEFs", "XEFs"]:
+        for p in [5, 50, 95]:
+            assert df[cef_type, p].values == pytest.approx(expected[cef_type].values, rel=1e-5)
+
+
+def test_draw_samples():
+    mo_f = pd.DataFrame(
+        dict(fuel_price=[10.0, 20.0], eff_min=[0.3, 0.5], eff_max=[0.4, 0.9]), index=["coal", "gas"]
+    )
+    samples = uncertainty.draw_samples(
+        mo_f,
+        fuels=["coal", "gas"],
+        carbon_price=25.0,
+        n_samples=5000,
+        rel_std={"fuel_price": 0.2, "carbon_price": 0.2, "efficiency": 0.1},
+        seed=42,
+    )
+    assert samples["x_k"].shape == (5000, 2)
+    assert samples["carbon_price"].shape == (5000,)
+    assert samples["x_k"].mean(axis=0) == pytest.approx([10.0, 20.0], rel=0.02)
+    assert samples["carbon_price"].mean() == pytest.approx(25.0, rel=0.02)
+    assert np.all(samples["eff_max"] <= 1.0)
+    assert np.all(samples["eff_min"] <= samples["eff_max"])
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from elmada import replay, web
+
+
+@pytest.fixture
+def stand_in_url():
+    web.set_stand_in_url("http://127.0.0.1:8765/")
+    yield "http://127.0.0.1:8765"
+    web.set_stand_in_url(None)
+
+
+def test_redirect(stand_in_url, monkeypatch):
+    assert web.redirect("https://morph.io/a/b.sqlite?key=1") == (
+        "http://127.0.0.1:8765/https/morph.io/a/b.sqlite?key=1"
+    )
+    assert web.redirect("http://globalenergyobservatory.org") == (
+        "http://127.0.0.1:8765/http/globalenergyobservatory.org/"
+    )
+    assert web.redirect(web.redirect("https://morph.io/")) == web.redirect("https://morph.io/")
+
+    web.set_stand_in_url(None)
+    assert web.redirect("https://morph.io/") == "https://morph.io/"
+    monkeypatch.setenv(web.STAND_IN_URL_ENV, "http://localhost:1")
+    assert web.redirect("https://morph.io/") == "http://localhost:1/https/morph.io/"
+
+
+def test_get(stand_in_url, mocker):
+    response = requests.Response()
+    response.status_code = 200
+    mock = mocker.patch("requests.adapters.HTTPAdapter.send", return_value=response)
+    web.get(web.BASE_URLS["opsd"] + "x.csv", allow_redirects=True)
+    request = mock.call_args.args[0]
+    assert request.url == f"{stand_in_url}/https/data.open-power-system-data.org/x.csv"
+
+
+def test_get_session():
+    session = web.get_session()
+    assert web.get_session() is session
+    assert session.get_adapter("https://morph.io/")._pool_maxsize == web.POOL_MAXSIZE
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(web.get_session).result() is not session
+
+
+def test_download(tmp_path):
+    url = web.BASE_URLS["opsd"] + "x.csv"
+    cassette = replay.Cassette(tmp_path / "cassette")
+    cassette.put("GET", url, 200, {"ETag": '"v1"'}, b"v1")
+    fp = tmp_path / "x.csv"
+
+    with replay.StandInServer(tmp_path / "cassette"):
+        assert web.download(url, fp, chunk_size=1)
+        assert not web.download(url, fp)
+        assert fp.read_bytes() == b"v1"
+
+        cassette.put("GET", url, 200, {"ETag": '"v2"'}, b"v2")
+        assert web.download(url, fp)
+        assert fp.read_bytes() == b"v2"
+
+        with pytest.raises(requests.HTTPError):
+            web.download(web.BASE_URLS["opsd"] + "missing.csv", fp)
+    assert fp.read_bytes() == b"v2"
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".x.csv.http.json", "cassette", "x.csv"]